@@ -8,8 +8,9 @@ Edit this file to change: MT5 credentials, API keys, risk limits,
 polling speed, session times, logging verbosity.
 """
 
+from datetime import timezone
 from pathlib import Path
-from pytz import timezone
+from zoneinfo import ZoneInfo   # Windows: needs the `tzdata` package
 
 # ─────────────────────────────────────────────
 # BOT IDENTITY
@@ -41,15 +42,19 @@ MT5_TERMINAL_PATH = r"C:\MT5\TradeCopier-Cluster_XAU-v3\terminal64.exe"
 MT5_SYMBOL        = "XAUUSD"
 
 # Reconnect settings if MT5 drops mid-session
-MT5_MAX_RECONNECT_ATTEMPTS = 5
-MT5_RECONNECT_WAIT_SECONDS = 10
+# Attempt 1 re-initializes immediately (no shutdown); later attempts shut the
+# terminal link down first and back off exponentially: 2s, 4s, 8s … ≤ max.
+MT5_MAX_RECONNECT_ATTEMPTS     = 5
+MT5_RECONNECT_WAIT_SECONDS     = 2    # base backoff before attempt 2
+MT5_RECONNECT_MAX_WAIT_SECONDS = 30   # backoff cap
 
 # ─────────────────────────────────────────────
 # TIMEZONES
 # ─────────────────────────────────────────────
 
-LOCAL_TZ = timezone("Europe/London")
-SIRIX_TZ = timezone("Asia/Jerusalem")   # SiRiX server clock
+UTC      = timezone.utc
+LOCAL_TZ = ZoneInfo("Europe/London")
+SIRIX_TZ = ZoneInfo("Asia/Jerusalem")   # SiRiX server clock
 
 # ─────────────────────────────────────────────
 # SIRIX REST API
@@ -92,6 +97,10 @@ USE_SESSION_FILTER  = False
 SESSION_START_HHMM  = "08:00"
 SESSION_END_HHMM    = "18:00"
 
+# Parsed once at import — (hour, minute) tuples used by filters.within_session
+SESSION_START_HM    = tuple(map(int, SESSION_START_HHMM.split(":")))
+SESSION_END_HM      = tuple(map(int, SESSION_END_HHMM.split(":")))
+
 # ─────────────────────────────────────────────
 # NO-TRADE ZONES  (JSON file override)
 # ─────────────────────────────────────────────
@@ -106,13 +115,22 @@ USE_DAILY_LOSS_LIMITS        = True
 DAILY_LOSS_LIMIT_TOTAL       = 1000.0   # USD across ALL engines
 DAILY_LOSS_LIMIT_PER_ENGINE  = 500.0    # USD per magic number
 
+# ─────────────────────────────────────────────
+# STATE SNAPSHOT
+# ─────────────────────────────────────────────
+
+STATE_WRITE_MIN_INTERVAL_SECONDS = 5      # throttle bot_state.json rewrites (flatten/breach always write)
+STATE_PRETTY_JSON                = False  # True → indent=2 (≈2× bytes, for manual debugging)
+
 # ─────────────────────────────────────────────
 # LOGGING VERBOSITY
 # ─────────────────────────────────────────────
 
+LOG_MIN_LEVEL          = "INFO"  # DEBUG | INFO | WARN | ERROR — lower levels are dropped
 VERBOSE_CLUSTERS       = True    # log cluster detections
 VERBOSE_CLUSTER_DEBUG  = False   # noisy per-loop cluster stats
 VERBOSE_HYBRID         = True    # log RSI/VWAP values at each decision
+VERBOSE_TRADE_EVENTS   = True    # log per-position SL adjustments (breakeven moves)
 
 # Heartbeat intervals (0 = OFF)
 COOLDOWN_HEARTBEAT_SECONDS = 0
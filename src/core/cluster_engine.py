@@ -9,18 +9,36 @@ Architecture note:
 """
 from __future__ import annotations
 
+from array import array
 from collections import deque
-from datetime import datetime, timedelta
-from typing import Optional, List
+from datetime import datetime
+from typing import Optional, List, Tuple
 
-from config.config import CLUSTER_REFRACTORY_SECONDS, VERBOSE_CLUSTERS, VERBOSE_CLUSTER_DEBUG
+import numpy as np
+
+import config.config as _config
+from config.config import UTC, SEEN_ORDERS_MAX_AGE_HOURS
 from src.core.models import SirixPositionEvent
 from src.core.logger import log
 
+# Ring capacity: preallocated from the expected window population (× safety),
+# rounded up to a power of two; only doubles if a burst exceeds it.
+_MIN_CAPACITY       = 64
+_CAPACITY_SAFETY    = 4
+_RECENT_MAXLEN      = 10
+
+
+def _ref_counts(user_ids: np.ndarray) -> dict[str, int]:
+    """user_id → occurrences, deduplicated by numpy.unique."""
+    if not user_ids.size:
+        return {}
+    uniq, counts = np.unique(user_ids, return_counts=True)
+    return dict(zip(uniq.tolist(), counts.tolist()))
+
 
 class ClusterEngine:
     """
-    Maintains a rolling deque of SiRiX open-position events and detects
+    Maintains a rolling window of SiRiX open-position events and detects
     BUY / SELL clusters based on unique-trader count within a time window.
 
     KEY DESIGN:
@@ -29,16 +47,273 @@ class ClusterEngine:
       open times", so late-delivered batches don't inflate the window.
     """
 
-    def __init__(self, window_seconds: int, k_unique: int):
+    def __init__(
+        self,
+        window_seconds: int,
+        k_unique: int,
+        expected_events_per_sec: float = 20.0,
+    ):
         self.window_seconds = window_seconds
         self.k_unique       = k_unique
 
-        # Deque of SirixPositionEvent (event-time sorted)
-        self.events: deque[SirixPositionEvent] = deque()
+        # SoA ring buffer of in-window events (event-time sorted).
+        # Parallel slots: epoch seconds, user_id, side code (0=buy, 1=sell).
+        # Capacity is a power of two so slot = (head + i) & mask.
+        hint = int(window_seconds * expected_events_per_sec * _CAPACITY_SAFETY)
+        cap  = _MIN_CAPACITY
+        while cap < hint:
+            cap *= 2
+        self._times = array("d", bytes(8 * cap))
+        self._users: list[Optional[str]] = [None] * cap
+        self._sides = bytearray(cap)
+        self._mask  = cap - 1
+        self._head  = 0
+        self._size  = 0
+
+        # Force a trim regardless of interval once the ring is this full
+        self._soft_cap = cap // 2
+
+        # Last few events (full objects) — for the state snapshot only
+        self.recent: deque[SirixPositionEvent] = deque(maxlen=_RECENT_MAXLEN)
+
+        # OrderID de-dup (O(1) hash lookups), expired after the same age as
+        # the upstream SeenOrdersCache. Kept across reset() so an already-
+        # counted order can never re-enter the window after a fill.
+        self._seen_order_ids: set[str] = set()
+        self._seen_order_log: deque[Tuple[float, str]] = deque()   # (time_ts, order_id)
+        self._seen_max_age:   float = SEEN_ORDERS_MAX_AGE_HOURS * 3600.0
+
+        # Config flags bound per instance (LOAD_FAST in add_events)
+        self._verbose:     bool  = False
+        self._verbose_dbg: bool  = False
+        self._refractory:  float = 0.0
+        self.reload_flags()
+
+        # Incremental per-side reference counts: user_id → events in window.
+        # Updated on append / evict so unique counts never need a full rescan.
+        self.buy_counts:  dict[str, int] = {}
+        self.sell_counts: dict[str, int] = {}
+        self.buy_unique:  int = 0
+        self.sell_unique: int = 0
 
         # Anti-spam: track last cluster to enforce refractory period
         self.last_cluster_time: Optional[datetime] = None
         self.last_cluster_side: Optional[str]      = None
+        self.last_cluster_ts:   Optional[float]    = None
+
+        # Amortised trimming: evict at most every _trim_interval event-seconds.
+        # Between trims the counters are an UPPER bound (stale events only add
+        # traders), so a below-K result is exact; a K-crossing forces a trim.
+        self._trim_interval: int   = max(1, window_seconds // 4)
+        self._last_trim_ts:  float = 0.0
+
+    def reload_flags(self) -> None:
+        """Re-read verbosity and refractory settings from config.config."""
+        self._verbose     = bool(_config.VERBOSE_CLUSTERS)
+        self._verbose_dbg = bool(_config.VERBOSE_CLUSTER_DEBUG)
+        self._refractory  = float(_config.CLUSTER_REFRACTORY_SECONDS)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ── Incremental window bookkeeping ───────────────────────────────────
+
+    def _grow(self) -> None:
+        """Double ring capacity, re-linearising so head becomes slot 0."""
+        cap   = self._mask + 1
+        log(
+            f"[CLUSTER] window ring full at {cap} events "
+            f"(T={self.window_seconds}s) — growing; raise expected_events_per_sec",
+            level="WARN",
+        )
+        order = [(self._head + i) & self._mask for i in range(self._size)]
+
+        times = array("d", bytes(16 * cap))
+        users: list[Optional[str]] = [None] * (2 * cap)
+        sides = bytearray(2 * cap)
+        for i, j in enumerate(order):
+            times[i] = self._times[j]
+            users[i] = self._users[j]
+            sides[i] = self._sides[j]
+
+        self._times, self._users, self._sides = times, users, sides
+        self._mask = 2 * cap - 1
+        self._head = 0
+
+    def _dedup(self, new_events: List[SirixPositionEvent]) -> List[SirixPositionEvent]:
+        """Drop events whose OrderID was already ingested; expire old IDs."""
+        seen, order_log = self._seen_order_ids, self._seen_order_log
+        fresh: List[SirixPositionEvent] = []
+        for ev in new_events:
+            before = len(seen)
+            seen.add(ev.order_id)          # add-and-check-size: one hash lookup
+            if len(seen) == before:
+                continue
+            order_log.append((ev.time_ts, ev.order_id))
+            fresh.append(ev)
+
+        if order_log:
+            cutoff = order_log[-1][0] - self._seen_max_age
+            while order_log and order_log[0][0] < cutoff:
+                seen.discard(order_log.popleft()[1])
+        return fresh
+
+    def _ingest(self, new_events: List[SirixPositionEvent]) -> None:
+        """
+        Append a batch of events and bump each side's reference counts.
+
+        Hot path: capacity is reserved once for the whole batch, and the ring
+        arrays / counter dicts are bound to locals so the per-event body is
+        a handful of fast local loads (no method call or attribute chase).
+        """
+        while self._size + len(new_events) > self._mask + 1:
+            self._grow()
+
+        times, users, sides = self._times, self._users, self._sides
+        counts = (self.buy_counts, self.sell_counts)   # indexed by side_code
+        mask   = self._mask
+        slot   = self._head + self._size
+        new_unique = [0, 0]
+
+        for ev in new_events:
+            i        = slot & mask
+            uid      = ev.user_id
+            code     = ev.side_code
+            times[i] = ev.time_ts
+            users[i] = uid
+            sides[i] = code
+            d = counts[code]
+            c = d.get(uid, 0)
+            d[uid] = c + 1
+            if c == 0:
+                new_unique[code] += 1
+            slot += 1
+
+        self._size       += len(new_events)
+        self.buy_unique  += new_unique[0]
+        self.sell_unique += new_unique[1]
+        self.recent.extend(new_events)
+
+    def _evict(self) -> None:
+        """Drop the oldest event and release its reference count."""
+        slot = self._head
+        user = self._users[slot]
+        self._users[slot] = None
+        self._head  = (slot + 1) & self._mask
+        self._size -= 1
+
+        if self._sides[slot] == 0:
+            c = self.buy_counts[user] - 1
+            if c == 0:
+                del self.buy_counts[user]
+                self.buy_unique -= 1
+            else:
+                self.buy_counts[user] = c
+        else:
+            c = self.sell_counts[user] - 1
+            if c == 0:
+                del self.sell_counts[user]
+                self.sell_unique -= 1
+            else:
+                self.sell_counts[user] = c
+
+    def reset(self) -> None:
+        """Clear the window and refractory state (after a fill or flatten)."""
+        for i in range(self._size):
+            self._users[(self._head + i) & self._mask] = None
+        self._head = 0
+        self._size = 0
+        self.recent.clear()
+        self.buy_counts.clear()
+        self.sell_counts.clear()
+        self.buy_unique  = 0
+        self.sell_unique = 0
+        self.last_cluster_time = None
+        self.last_cluster_side = None
+        self.last_cluster_ts   = None
+        self._last_trim_ts     = 0.0
+
+    def _trim(self, latest_ts: float) -> None:
+        """
+        Evict events older than latest_ts − T.
+
+        Expired slots are counted first (float compares only). If more than
+        half the window has expired — e.g. after a long quiet gap — the head
+        jumps past them in one step and the counters are rebuilt from the
+        survivors, instead of decrementing once per evicted event.
+        """
+        cutoff_ts = latest_ts - self.window_seconds
+        times, head, mask = self._times, self._head, self._mask
+
+        expired = 0
+        while expired < self._size and times[(head + expired) & mask] < cutoff_ts:
+            expired += 1
+
+        if expired > self._size - expired:
+            for i in range(expired):
+                self._users[(head + i) & mask] = None
+            self._head  = (head + expired) & mask
+            self._size -= expired
+            self.rebuild_counts()
+        else:
+            for _ in range(expired):
+                self._evict()
+        self._last_trim_ts = latest_ts
+
+    def settle(self) -> None:
+        """
+        Apply any deferred trim, so len() / buy_unique / sell_unique /
+        window_events() are exact for latest_ts − T (snapshot readers).
+        """
+        latest_ts = self.latest_ts()
+        if latest_ts is not None and latest_ts != self._last_trim_ts:
+            self._trim(latest_ts)
+
+    def _live(self) -> Tuple[List[Optional[str]], np.ndarray]:
+        """In-window (users, side codes) in event order, unwrapping the ring."""
+        head, end = self._head, self._head + self._size
+        sides = np.frombuffer(self._sides, dtype=np.int8)
+        if end <= self._mask + 1:
+            return self._users[head:end], sides[head:end]
+        end &= self._mask
+        return (
+            self._users[head:] + self._users[:end],
+            np.concatenate((sides[head:], sides[:end])),
+        )
+
+    def rebuild_counts(self) -> None:
+        """
+        Recompute per-side reference counts from the ring contents.
+        Cold path (bulk trims / reconciliation): dedup runs in C via
+        numpy.unique rather than a Python-level loop over every slot.
+        """
+        users, sides = self._live()
+        users_arr    = np.array(users, dtype=object)
+
+        self.buy_counts  = _ref_counts(users_arr[sides == 0])
+        self.sell_counts = _ref_counts(users_arr[sides == 1])
+        self.buy_unique  = len(self.buy_counts)
+        self.sell_unique = len(self.sell_counts)
+
+    def latest_ts(self) -> Optional[float]:
+        """Epoch seconds of the newest in-window event (None if empty)."""
+        if not self._size:
+            return None
+        return self._times[(self._head + self._size - 1) & self._mask]
+
+    @property
+    def last_event_time(self) -> Optional[datetime]:
+        """Newest in-window event time as a UTC datetime (None if empty)."""
+        ts = self.latest_ts()
+        return datetime.fromtimestamp(ts, tz=UTC) if ts is not None else None
+
+    def window_events(self) -> List[SirixPositionEvent]:
+        """Recent events that are still inside the window (state snapshot)."""
+        latest_ts = self.latest_ts()
+        if latest_ts is None:
+            return []
+        cutoff_ts = latest_ts - self.window_seconds
+        return [ev for ev in self.recent if ev.time_ts >= cutoff_ts]
 
     def add_events(self, new_events: List[SirixPositionEvent]) -> Optional[str]:
         """
@@ -49,44 +324,56 @@ class ClusterEngine:
           "sell" if a SELL cluster is detected
           None   if no cluster (or refractory active)
         """
-        # 1) Append all new events
-        for ev in new_events:
-            self.events.append(ev)
+        # 0) Nothing new → nothing can change. The window is anchored to the
+        #    latest event time, so counts, trim cutoff and refractory state are
+        #    exactly as the previous call left them (which did not fire again).
+        if not new_events:
+            return None
+
+        # 1) Append all new (not previously ingested) events
+        new_events = self._dedup(new_events)
+        if not new_events:
+            return None
+        self._ingest(new_events)
 
-        if not self.events:
+        if not self._size:
             return None
 
         # 2) Trim window: keep only events within [latest_time - T, latest_time]
-        latest_time = self.events[-1].time
-        cutoff      = latest_time - timedelta(seconds=self.window_seconds)
-        while self.events and self.events[0].time < cutoff:
-            self.events.popleft()
+        #    (amortised — skipped until the interval elapses or the ring fills)
+        latest_ts = self.latest_ts()
+        trimmed   = (
+            latest_ts - self._last_trim_ts >= self._trim_interval
+            or self._size > self._soft_cap
+        )
+        if trimmed:
+            self._trim(latest_ts)
 
-        if not self.events:
-            return None
+        # 3) Unique traders per side — maintained incrementally by _ingest/_evict
+        #    If an untrimmed window reaches K, trim now and re-read exact counts.
+        if not trimmed and (
+            self.buy_unique >= self.k_unique or self.sell_unique >= self.k_unique
+        ):
+            self._trim(latest_ts)
 
-        # 3) Count unique traders per side within the window
-        buy_users:  set = set()
-        sell_users: set = set()
-        for ev in self.events:
-            if ev.side == "buy":
-                buy_users.add(ev.user_id)
-            else:
-                sell_users.add(ev.user_id)
+        if self._verbose_dbg:
+            self.settle()   # debug line reports the exact window
+
+        buy_unique  = self.buy_unique
+        sell_unique = self.sell_unique
 
-        if VERBOSE_CLUSTER_DEBUG:
+        if self._verbose_dbg:
             log(
-                f"[CLUSTER_DEBUG] T={self.window_seconds}s | "
-                f"events={len(self.events)} | "
-                f"buy_unique={len(buy_users)} | sell_unique={len(sell_users)} | "
-                f"latest={latest_time.isoformat()}"
+                "[CLUSTER_DEBUG] T=%ds | events=%d | buy_unique=%d | sell_unique=%d | latest=%s",
+                self.window_seconds, self._size, buy_unique, sell_unique,
+                datetime.fromtimestamp(latest_ts, tz=UTC).isoformat(),
             )
 
         # 4) Determine cluster side (largest side wins; buy takes priority on tie)
         cluster_side: Optional[str] = None
-        if len(buy_users) >= self.k_unique:
+        if buy_unique >= self.k_unique:
             cluster_side = "buy"
-        elif len(sell_users) >= self.k_unique:
+        elif sell_unique >= self.k_unique:
             cluster_side = "sell"
 
         if cluster_side is None:
@@ -94,22 +381,22 @@ class ClusterEngine:
 
         # 5) Refractory: suppress repeat clusters of the same side within 1 second
         if (
-            self.last_cluster_time is not None
+            self.last_cluster_ts is not None
             and self.last_cluster_side == cluster_side
-            and (latest_time - self.last_cluster_time)
-                < timedelta(seconds=CLUSTER_REFRACTORY_SECONDS)
+            and (latest_ts - self.last_cluster_ts) < self._refractory
         ):
             return None
 
         # 6) Cluster confirmed — record and return
-        self.last_cluster_time = latest_time
+        self.last_cluster_ts   = latest_ts
+        self.last_cluster_time = datetime.fromtimestamp(latest_ts, tz=UTC)
         self.last_cluster_side = cluster_side
 
-        if VERBOSE_CLUSTERS:
+        if self._verbose:
             log(
                 f"[CLUSTER] {cluster_side.upper()} detected "
                 f"(T={self.window_seconds}s, K={self.k_unique}, "
-                f"buy_u={len(buy_users)}, sell_u={len(sell_users)})"
+                f"buy_u={buy_unique}, sell_u={sell_unique})"
             )
 
         return cluster_side
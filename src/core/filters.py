@@ -14,11 +14,17 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Tuple
 
 from config.config import (
-    USE_SESSION_FILTER, SESSION_START_HHMM, SESSION_END_HHMM,
+    USE_SESSION_FILTER, SESSION_START_HM, SESSION_END_HM,
     USE_NO_TRADE_ZONES, NO_TRADE_ZONES_PATH, LOCAL_TZ,
 )
 from src.core.logger import log
 
+# Parsed zone: (start_local, end_local, reason)
+Zone = Tuple[datetime, datetime, str]
+
+# Re-parsed only when no_trade_zones.json changes on disk: (mtime_ns, zones)
+_ZONES_CACHE: Optional[Tuple[int, List[Zone]]] = None
+
 
 # ─────────────────────────────────────────────
 # SESSION FILTER
@@ -33,8 +39,8 @@ def within_session() -> bool:
         return True
 
     now = datetime.now(LOCAL_TZ)
-    h_s, m_s = map(int, SESSION_START_HHMM.split(":"))
-    h_e, m_e = map(int, SESSION_END_HHMM.split(":"))
+    h_s, m_s = SESSION_START_HM
+    h_e, m_e = SESSION_END_HM
 
     start = now.replace(hour=h_s, minute=m_s, second=0, microsecond=0)
     end   = now.replace(hour=h_e, minute=m_e, second=0, microsecond=0)
@@ -48,9 +54,9 @@ def within_session() -> bool:
 # NO-TRADE ZONES
 # ─────────────────────────────────────────────
 
-def load_no_trade_zones() -> List[dict]:
+def load_no_trade_zones() -> List[Zone]:
     """
-    Read no_trade_zones.json.
+    Read no_trade_zones.json and parse it into (start, end, reason) tuples.
     Expected format:
       [
         {
@@ -61,37 +67,53 @@ def load_no_trade_zones() -> List[dict]:
         ...
       ]
     Times are interpreted in Europe/London timezone.
+    Malformed entries are skipped once, at parse time.
+    The parsed list is cached and only rebuilt when the file's mtime changes.
     Returns empty list if file missing or USE_NO_TRADE_ZONES is False.
     """
+    global _ZONES_CACHE
+
     if not USE_NO_TRADE_ZONES:
         return []
-    if not NO_TRADE_ZONES_PATH.exists():
+    try:
+        mtime = NO_TRADE_ZONES_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
         return []
+
+    if _ZONES_CACHE is not None and _ZONES_CACHE[0] == mtime:
+        return _ZONES_CACHE[1]
+
     try:
         data = json.loads(NO_TRADE_ZONES_PATH.read_text(encoding="utf-8"))
-        return data if isinstance(data, list) else []
     except Exception as e:
         log(f"[FILTERS] Failed to load no_trade_zones.json: {e}", level="WARN")
         return []
 
+    zones: List[Zone] = []
+    for z in data if isinstance(data, list) else []:
+        try:
+            start = datetime.strptime(z["start_local"], "%Y-%m-%d %H:%M").replace(tzinfo=LOCAL_TZ)
+            end   = datetime.strptime(z["end_local"],   "%Y-%m-%d %H:%M").replace(tzinfo=LOCAL_TZ)
+            zones.append((start, end, z.get("reason", "no_trade_zone")))
+        except Exception:
+            continue   # malformed entry — skip silently
+
+    _ZONES_CACHE = (mtime, zones)
+    return zones
+
 
 def check_no_trade_zone(
     now_utc: datetime,
-    zones: List[dict],
+    zones: List[Zone],
 ) -> Tuple[bool, Optional[str]]:
     """
     Returns (in_zone: bool, reason: str|None).
-    Checks current UTC time against each configured zone window.
+    Checks current UTC time against each pre-parsed zone window.
     """
     now_local = now_utc.astimezone(LOCAL_TZ)
 
-    for z in zones:
-        try:
-            start = datetime.strptime(z["start_local"], "%Y-%m-%d %H:%M").replace(tzinfo=LOCAL_TZ)
-            end   = datetime.strptime(z["end_local"],   "%Y-%m-%d %H:%M").replace(tzinfo=LOCAL_TZ)
-            if start <= now_local <= end:
-                return True, z.get("reason", "no_trade_zone")
-        except Exception:
-            continue   # malformed entry — skip silently
+    for start, end, reason in zones:
+        if start <= now_local <= end:
+            return True, reason
 
     return False, None
@@ -1,32 +1,67 @@
 # src/core/indicators.py
 """
 Technical indicator calculations.
-All functions are pure: they take a DataFrame and return a float.
-No side effects, no global state.
+Indicator functions are pure: they take a DataFrame and return a float.
+The only module state is the short-TTL M1 fetch cache and the optional
+per-symbol RSI running sums and VWAP closed-bar sums.
 
 DataFrame expected columns: time (UTC datetime64), open, high, low, close, tick_volume
 """
 from __future__ import annotations
 
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 import MetaTrader5 as mt5
 
+from config.config import POLL_INTERVAL_SECONDS
+from src.mt5.connection import MT5_LOCK
+
 
 # ─────────────────────────────────────────────
 # DATA FETCHING
 # ─────────────────────────────────────────────
 
+_TIMEFRAME_M1 = mt5.TIMEFRAME_M1
+
+# Short-lived per-symbol cache so ATR / RSI / VWAP / trailing in the same
+# poll share one terminal RPC:  symbol → (fetched_at_monotonic, bars, df)
+_M1_CACHE_TTL_SECONDS = min(0.5, POLL_INTERVAL_SECONDS / 2)
+_M1_CACHE: Dict[str, Tuple[float, int, pd.DataFrame]] = {}
+
+
 def fetch_m1_rates(symbol: str, bars: int = 300) -> pd.DataFrame:
     """
     Fetch M1 OHLCV candles from MT5.
     bars: how many M1 candles to fetch (300 = 5 hours, enough for VWAP + ATR).
+
+    Results are reused for _M1_CACHE_TTL_SECONDS: any request for the same
+    symbol with bars <= the cached fetch is served as a tail slice. The cache
+    always refetches at the largest size seen, so mixed callers converge on
+    a single RPC per poll. Returned frames must be treated as read-only.
     """
-    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 0, bars)
+    now = time.monotonic()
+    hit = _M1_CACHE.get(symbol)
+    if hit is not None:
+        fetched_at, cached_bars, cached_df = hit
+        if now - fetched_at < _M1_CACHE_TTL_SECONDS and bars <= cached_bars:
+            return cached_df if bars == cached_bars else cached_df.iloc[-bars:]
+        bars_to_fetch = max(bars, cached_bars)
+    else:
+        bars_to_fetch = bars
+
+    with MT5_LOCK:
+        rates = mt5.copy_rates_from_pos(symbol, _TIMEFRAME_M1, 0, bars_to_fetch)
     if rates is None:
         raise RuntimeError(f"MT5 returned no rates for {symbol} — is the symbol selected?")
     df = pd.DataFrame(rates)
     df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)
-    return df
+
+    _M1_CACHE[symbol] = (now, bars_to_fetch, df)
+    return df if bars_to_fetch == bars else df.iloc[-bars:]
 
 
 # ─────────────────────────────────────────────
@@ -39,30 +74,134 @@ def compute_atr(df: pd.DataFrame, period: int) -> float:
     Used for:
       - sizing the initial SL distance (entry ± ATR × atr_init_mult)
       - driving the chandelier / atr_trailing stop updates
+
+    Computed on the raw NumPy columns: one True Range array, one trailing
+    mean — no intermediate DataFrames for a single scalar.
     """
-    high  = df["high"]
-    low   = df["low"]
-    close = df["close"]
-    prev  = close.shift(1)
-
-    tr = pd.concat(
-        [high - low, (high - prev).abs(), (low - prev).abs()],
-        axis=1,
-    ).max(axis=1)
-
-    atr_val = tr.rolling(period).mean().iloc[-1]
-    if pd.isna(atr_val):
+    high  = df["high"].to_numpy(dtype=np.float64)
+    low   = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+
+    rng = high - low
+    if len(rng) < period:
         # Not enough bars: fall back to simple average of last `period` ranges
-        atr_val = (high - low).tail(period).mean()
+        return float(rng[-period:].mean())
+
+    # TR[0] has no previous close → plain high-low range
+    prev = close[:-1]
+    tr   = rng.copy()
+    np.maximum(tr[1:], np.abs(high[1:] - prev), out=tr[1:])
+    np.maximum(tr[1:], np.abs(low[1:]  - prev), out=tr[1:])
 
-    return float(atr_val)
+    return float(tr[-period:].mean())
+
+
+# ─────────────────────────────────────────────
+# STREAMING TRAIL STATS  (ATR + rolling HH / LL)
+# ─────────────────────────────────────────────
+
+class TrailStats:
+    """
+    Streaming equivalent of compute_atr(df, period) plus the rolling
+    max(high) / min(low) over the last `lookback` bars, for one strategy.
+
+    Closed bars are folded in once each — TRs into a (period-1)-long window,
+    highs / lows into monotonic deques — so a poll inside the same M1 bar
+    only combines those closed-bar stats with the forming bar: O(1).
+    Rebuilt from the passed frame if it no longer overlaps the cached bars.
+    """
+
+    __slots__ = ("period", "lookback", "_last_closed", "_k", "_tr", "_tr_sum", "_hh", "_ll")
+
+    def __init__(self, period: int, lookback: int):
+        self.period   = period
+        self.lookback = lookback
+        self._reset()
+
+    def _reset(self) -> None:
+        self._last_closed: Optional[int] = None     # time value of last folded bar
+        self._k      = 0                             # running closed-bar index
+        self._tr     = deque(maxlen=max(0, self.period - 1))
+        self._tr_sum = 0.0
+        self._hh: deque = deque()                    # (k, high), highs decreasing
+        self._ll: deque = deque()                    # (k, low),  lows increasing
+
+    def update(self, df: pd.DataFrame) -> Tuple[float, float, float]:
+        """Return (atr, highest_high, lowest_low) for `df` (forming bar last)."""
+        high  = df["high"].to_numpy(dtype=np.float64)
+        low   = df["low"].to_numpy(dtype=np.float64)
+        close = df["close"].to_numpy(dtype=np.float64)
+        times = df["time"].array.asi8
+        n     = len(close)
+        need  = max(self.period, self.lookback)      # bars incl. the forming one
+        if n < need + 1:
+            # Too short to stream (TR[0] edge case) — plain computation
+            return (
+                compute_atr(df, self.period),
+                float(high[-self.lookback:].max()),
+                float(low[-self.lookback:].min()),
+            )
+
+        start = n - need                             # first closed bar to fold on rebuild
+        if self._last_closed is not None:
+            i = int(np.searchsorted(times, self._last_closed, side="left"))
+            if i < n - 1 and times[i] == self._last_closed and i + 1 >= start:
+                start = i + 1
+            else:
+                self._reset()
+
+        if start < n - 1:
+            self._fold(high, low, close, start, n - 1)
+            self._last_closed = int(times[n - 2])
+
+        # ── Combine with the forming bar ──────────────────────────────────
+        h, l, pc = high[-1], low[-1], close[-2]
+        tr_f = max(h - l, abs(h - pc), abs(l - pc))
+        atr  = (self._tr_sum + tr_f) / self.period
+        hh   = max(self._hh[0][1], h) if self._hh else h
+        ll   = min(self._ll[0][1], l) if self._ll else l
+        return float(atr), float(hh), float(ll)
+
+    def _fold(self, high, low, close, start: int, stop: int) -> None:
+        """Ingest closed bars [start, stop) (start >= 1, so close[j-1] exists)."""
+        tr, hh, ll = self._tr, self._hh, self._ll
+        window     = self.lookback - 1
+        k          = self._k
+        if tr.maxlen:
+            # True Ranges for the whole span in one pass (deque keeps the tail)
+            h, l, pc = high[start:stop], low[start:stop], close[start - 1:stop - 1]
+            tr.extend(np.maximum(np.maximum(h - l, np.abs(h - pc)), np.abs(l - pc)).tolist())
+        for j in range(start, stop):
+            h, l = high[j], low[j]
+            if window > 0:
+                while hh and hh[-1][1] <= h:
+                    hh.pop()
+                hh.append((k, h))
+                while ll and ll[-1][1] >= l:
+                    ll.pop()
+                ll.append((k, l))
+            k += 1
+        # Evict bars that fell out of the (lookback-1)-bar closed window
+        while hh and hh[0][0] < k - window:
+            hh.popleft()
+        while ll and ll[0][0] < k - window:
+            ll.popleft()
+        self._k      = k
+        self._tr_sum = float(sum(tr))
 
 
 # ─────────────────────────────────────────────
 # RSI  (Relative Strength Index)
 # ─────────────────────────────────────────────
 
-def compute_rsi(df: pd.DataFrame, period: int = 14) -> float:
+# Per-(symbol, period) Wilder sums over CLOSED bars:
+#   (symbol, period) → (last_closed_bar_epoch, last_closed_close,
+#                       gain_num, loss_num, weight_sum)
+# Folding a new bar is num = decay·num + x, den = decay·den + 1.
+_RSI_STATE: Dict[Tuple[str, int], Tuple[int, float, float, float, float]] = {}
+
+
+def compute_rsi(df: pd.DataFrame, period: int = 14, symbol: Optional[str] = None) -> float:
     """
     Standard RSI(period) on M1 close prices.
 
@@ -72,28 +211,106 @@ def compute_rsi(df: pd.DataFrame, period: int = 14) -> float:
       RSI in middle zone    →  no strong momentum    (fade the crowd → inverse)
 
     Returns NaN-safe float; falls back to 50 if insufficient data.
+
+    Only the last value is needed, so the Wilder average (alpha = 1/period,
+    same weighting as pandas ewm(com=period-1)) is taken as a single
+    weighted dot product over the deltas instead of building full Series.
+
+    If `symbol` is given, the closed-bar sums are cached and only newly
+    closed bars are folded in (rebuilt if the bars no longer overlap the
+    cache); the forming bar's delta is added per call. The carried sums keep
+    terms older than the passed window, which differ by decay^len(df) ≈ 0.
     """
-    close = df["close"]
-    delta = close.diff()
+    close  = df["close"].to_numpy(dtype=np.float64)
+    deltas = np.diff(close)
+    if len(deltas) < period:
+        return 50.0
+
+    gain = np.clip(deltas, 0.0, None)
+    loss = np.clip(-deltas, 0.0, None)
+
+    if symbol is None:
+        avg_gain = _wilder_last(gain, period)
+        avg_loss = _wilder_last(loss, period)
+    else:
+        avg_gain, avg_loss = _wilder_last_cached(df, close, gain, loss, period, symbol)
+
+    if avg_loss == 0.0:
+        return 50.0
 
-    gain = delta.clip(lower=0)
-    loss = (-delta).clip(lower=0)
+    value = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    return 50.0 if np.isnan(value) else float(value)
 
-    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
 
-    rs    = avg_gain / avg_loss.replace(0.0, float("nan"))
-    rsi   = 100.0 - (100.0 / (1.0 + rs))
-    value = float(rsi.iloc[-1])
+def _wilder_last(x: np.ndarray, period: int) -> float:
+    """Last value of the adjusted EWM with alpha = 1/period (Wilder smoothing)."""
+    decay   = 1.0 - 1.0 / period
+    weights = decay ** np.arange(len(x) - 1, -1, -1, dtype=np.float64)
+    return float(np.dot(weights, x) / weights.sum())
 
-    return 50.0 if pd.isna(value) else value
+
+def _wilder_last_cached(
+    df: pd.DataFrame,
+    close: np.ndarray,
+    gain: np.ndarray,
+    loss: np.ndarray,
+    period: int,
+    symbol: str,
+) -> Tuple[float, float]:
+    """(avg_gain, avg_loss) via _RSI_STATE closed-bar sums + the forming bar."""
+    decay  = 1.0 - 1.0 / period
+    times  = _epoch_seconds(df["time"])
+    n      = len(close)
+    key    = (symbol, period)
+    cached = _RSI_STATE.get(key)
+
+    # deltas[k] = close[k+1] - close[k]; closed deltas end at bar n-2
+    start = 0
+    if cached is not None:
+        last_closed, last_close, g_num, l_num, w_sum = cached
+        i = int(np.searchsorted(times, last_closed, side="left"))
+        if i < n - 1 and times[i] == last_closed and close[i] == last_close:
+            start = i
+        else:
+            cached = None
+    if cached is None:
+        g_num = l_num = w_sum = 0.0
+
+    new = slice(start, n - 2)
+    m   = max(0, (n - 2) - start)
+    if m:
+        weights = decay ** np.arange(m - 1, -1, -1, dtype=np.float64)
+        carry   = decay ** m
+        g_num   = carry * g_num + float(np.dot(weights, gain[new]))
+        l_num   = carry * l_num + float(np.dot(weights, loss[new]))
+        w_sum   = carry * w_sum + float(weights.sum())
+
+    _RSI_STATE[key] = (int(times[n - 2]), float(close[n - 2]), g_num, l_num, w_sum)
+
+    # ── Add the forming bar's delta ──────────────────────────────────────
+    den = decay * w_sum + 1.0
+    return (decay * g_num + gain[-1]) / den, (decay * l_num + loss[-1]) / den
 
 
 # ─────────────────────────────────────────────
 # VWAP  (Volume-Weighted Average Price)
 # ─────────────────────────────────────────────
 
-def compute_vwap(df: pd.DataFrame) -> float:
+# Per-symbol closed-bar sums from the last call:
+#   symbol → (first_bar_epoch, last_closed_bar_epoch, pv_sum, v_sum)
+# Closed bars never change, so while the passed window spans the same closed
+# bars (same first bar, same last closed bar) the sums are reused as-is; any
+# other window is summed afresh from the passed bars, so the result depends
+# only on `df`. The last (still forming) bar is added per call.
+_VWAP_STATE: Dict[str, Tuple[int, int, float, float]] = {}
+
+
+def _epoch_seconds(times: pd.Series) -> np.ndarray:
+    """UTC-aware datetime column → int64 epoch seconds."""
+    return times.dt.tz_convert(None).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+def compute_vwap(df: pd.DataFrame, symbol: Optional[str] = None) -> float:
     """
     Intraday VWAP anchored to today's UTC midnight.
 
@@ -104,6 +321,10 @@ def compute_vwap(df: pd.DataFrame) -> float:
     Falls back to the full passed DataFrame if fewer than 2 bars exist today
     (e.g. if bot starts just after midnight).
 
+    If `symbol` is given, the closed-bar sums are cached per symbol and
+    reused until a new bar closes (or the window changes) — same result as
+    the uncached call for the same `df`.
+
     Used in hybrid direction decision:
       price significantly ABOVE vwap  →  bullish bias
       price significantly BELOW vwap  →  bearish bias
@@ -115,17 +336,36 @@ def compute_vwap(df: pd.DataFrame) -> float:
         → momentum confirms buying pressure / bounce → go WITH cluster (buy)
       Otherwise → INVERSE (fade the crowd)
     """
-    now_utc     = pd.Timestamp.now(tz="UTC")
-    today_start = now_utc.normalize()   # UTC midnight
+    times     = _epoch_seconds(df["time"])
+    day_start = int(pd.Timestamp.now(tz="UTC").normalize().timestamp())   # UTC midnight
+
+    first = int(np.searchsorted(times, day_start, side="left"))
+    if len(times) - first < 2:
+        first = 0           # not enough today-bars, use full window
 
-    today = df[df["time"] >= today_start].copy()
-    if len(today) < 2:
-        today = df.copy()   # not enough today-bars, use full window
+    high   = df["high"].to_numpy(dtype=np.float64)
+    low    = df["low"].to_numpy(dtype=np.float64)
+    close  = df["close"].to_numpy(dtype=np.float64)
+    volume = df["tick_volume"].to_numpy(dtype=np.float64)
 
-    typical_price = (today["high"] + today["low"] + today["close"]) / 3.0
-    volume        = today["tick_volume"].replace(0, 1)   # guard against 0-volume bars
+    # ── Closed-bar sums (everything except the forming last bar) ─────────
+    key    = (int(times[first]), int(times[-2]) if len(times) - first > 1 else -1)
+    cached = _VWAP_STATE.get(symbol) if symbol is not None else None
+    if cached is not None and cached[:2] == key:
+        pv_sum, v_sum = cached[2], cached[3]
+    else:
+        closed = slice(first, len(times) - 1)
+        vol    = np.where(volume[closed] == 0, 1.0, volume[closed])   # guard against 0-volume bars
+        tp     = (high[closed] + low[closed] + close[closed]) / 3.0
+        pv_sum = float(np.dot(tp, vol))
+        v_sum  = float(vol.sum())
+        if symbol is not None:
+            _VWAP_STATE[symbol] = key + (pv_sum, v_sum)
 
-    vwap_series = (typical_price * volume).cumsum() / volume.cumsum()
-    value       = float(vwap_series.iloc[-1])
+    # ── Add the forming bar ───────────────────────────────────────────────
+    vol_last = volume[-1] if volume[-1] != 0 else 1.0
+    pv_sum  += float((high[-1] + low[-1] + close[-1]) / 3.0 * vol_last)
+    v_sum   += float(vol_last)
 
-    return value if not pd.isna(value) else float(today["close"].iloc[-1])
+    value = pv_sum / v_sum if v_sum > 0 else float("nan")
+    return value if not np.isnan(value) else float(df["close"].iloc[-1])
@@ -8,7 +8,8 @@ FIX vs original script:
   written to JSONL again — every structured log line appeared twice in the file.
 
 Solution here:
-  - log_event() writes structured JSONL directly via _append_jsonl(),
+  - log_event() writes structured JSONL via _append_jsonl() (queued to a
+    background writer thread — file I/O never blocks the trading loop),
     and writes human-readable output directly to sys.__stdout__ (bypasses Tee).
   - StdTeeToJsonl is kept ONLY to capture raw print() calls from third-party
     code, exceptions, or any code path that does not go through log_event().
@@ -18,43 +19,137 @@ from __future__ import annotations
 
 import sys
 import json
+import queue
+import atexit
+import threading
 from pathlib import Path
-from datetime import datetime
-from typing import Optional, TYPE_CHECKING
+from datetime import datetime, timezone
+from typing import BinaryIO, Optional, TYPE_CHECKING
 
-from pytz import timezone
+import orjson
 
 if TYPE_CHECKING:
     from src.core.models import StrategyConfig
 
+_UTC = timezone.utc
+
 # Filled by init_logger() — avoids circular import from config
 _BOT_NAME: str = "XAU_Bot"
 _LOG_PATH: Optional[Path] = None
 
+# Level gate (stdlib logging numbers). Messages below it are dropped
+# before any payload is built or any lazy %-format is applied.
+_LEVEL_NUM = {
+    "DEBUG": 10, "INFO": 20, "WARN": 30, "WARNING": 30, "ERROR": 40, "CRITICAL": 50,
+}
+_MIN_LEVEL_NUM: int = 20
+
+# Persistent binary handle to the JSONL file (opened by init_logger).
+# orjson emits UTF-8 bytes, written as-is; flushed once per writer batch.
+_LOG_FILE: Optional[BinaryIO] = None
+
+# Real terminal, captured at import (StdTeeToJsonl later replaces sys.stdout)
+_REAL_STDOUT = sys.__stdout__
+
+# Background JSONL writer: callers enqueue dicts, one thread encodes + writes.
+# Bounded so a stalled disk can't grow memory; drops the OLDEST line when full.
+_QUEUE_MAXSIZE = 10_000
+_WRITE_BATCH   = 256
+_QUEUE: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=_QUEUE_MAXSIZE)
+_WRITER: Optional[threading.Thread] = None
 
-def init_logger(bot_name: str, log_path: Path) -> None:
+
+def init_logger(bot_name: str, log_path: Path, min_level: str = "INFO") -> None:
     """Call once at startup before any logging."""
-    global _BOT_NAME, _LOG_PATH
+    global _BOT_NAME, _LOG_PATH, _LOG_FILE, _WRITER, _MIN_LEVEL_NUM
     _BOT_NAME = bot_name
     _LOG_PATH = log_path
+    _MIN_LEVEL_NUM = _LEVEL_NUM.get(min_level.upper(), 20)
     log_path.parent.mkdir(parents=True, exist_ok=True)
 
+    # One open() for the process lifetime
+    if _WRITER is None:
+        _LOG_FILE = log_path.open("ab")
+        _WRITER   = threading.Thread(target=_writer_loop, name="jsonl-writer", daemon=True)
+        _WRITER.start()
+        atexit.register(_shutdown_writer)
+
+    # Line-buffer the terminal too, so log_event needs no explicit flush()
+    try:
+        _REAL_STDOUT.reconfigure(line_buffering=True)
+    except Exception:
+        pass
+
 
 # ─────────────────────────────────────────────
 # LOW-LEVEL FILE WRITER
 # ─────────────────────────────────────────────
 
 def _append_jsonl(obj: dict) -> None:
-    """Append one JSON object as a line to the log file. Never raises."""
-    if _LOG_PATH is None:
+    """Queue one JSON object for the writer thread. Never raises or blocks."""
+    if _LOG_FILE is None:
+        return
+    try:
+        _QUEUE.put_nowait(obj)
+    except queue.Full:
+        try:
+            _QUEUE.get_nowait()   # drop oldest
+        except queue.Empty:
+            pass
+        try:
+            _QUEUE.put_nowait(obj)
+        except queue.Full:
+            pass
+
+
+def _writer_loop() -> None:
+    """Drain the queue in batches of up to _WRITE_BATCH lines per write()."""
+    while True:
+        item = _QUEUE.get()
+        batch = [item]
+        while item is not None and len(batch) < _WRITE_BATCH:
+            try:
+                item = _QUEUE.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+
+        lines = b"".join(_encode(obj) for obj in batch if obj is not None)
+        try:
+            if lines:
+                _LOG_FILE.write(lines)
+                _LOG_FILE.flush()
+        except Exception as e:
+            # Never crash the bot due to a logging failure
+            _REAL_STDOUT.write(f"[LOGGER][WARN] write failed: {e}\n")
+
+        if batch[-1] is None:   # shutdown sentinel
+            return
+
+
+def _encode(obj: dict) -> bytes:
+    """One JSONL line as UTF-8 bytes (orjson; stdlib fallback for odd types)."""
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    except TypeError:
+        return (json.dumps(obj, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+
+def _json_default(o):
+    return o.isoformat() if isinstance(o, datetime) else str(o)
+
+
+def _shutdown_writer() -> None:
+    """Flush pending lines and close the file (registered with atexit)."""
+    if _WRITER is None:
         return
     try:
-        with _LOG_PATH.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-            f.flush()
-    except Exception as e:
-        # Never crash the bot due to a logging failure
-        sys.__stdout__.write(f"[LOGGER][WARN] write failed: {e}\n")
+        _QUEUE.put(None, timeout=1.0)
+        _WRITER.join(timeout=2.0)
+    except Exception:
+        pass
+    if _LOG_FILE is not None:
+        _LOG_FILE.close()
 
 
 # ─────────────────────────────────────────────
@@ -62,13 +157,28 @@ def _append_jsonl(obj: dict) -> None:
 # ─────────────────────────────────────────────
 
 def _utc_now() -> datetime:
-    return datetime.now(timezone("UTC"))
+    return datetime.now(_UTC)
+
+
+# Terminal timestamp text, memoised per whole second
+_LAST_TS_SEC: int = -1
+_LAST_TS_STR: str = ""
+
+
+def _ts_text(ts: datetime) -> str:
+    """'YYYY-MM-DD HH:MM:SS' for ts — strftime runs at most once per second."""
+    global _LAST_TS_SEC, _LAST_TS_STR
+    sec = int(ts.timestamp())
+    if sec != _LAST_TS_SEC:
+        _LAST_TS_STR = ts.strftime("%Y-%m-%d %H:%M:%S")
+        _LAST_TS_SEC = sec
+    return _LAST_TS_STR
 
 
 def log_event(
     level: str,
     msg: str,
-    *,
+    *args,
     cfg: Optional["StrategyConfig"] = None,
     **fields,
 ) -> None:
@@ -76,13 +186,22 @@ def log_event(
     Unified structured logger.
     - Writes JSON line to log file (once).
     - Writes human-readable line to real terminal (bypassing StdTeeToJsonl).
+    Both streams are line-buffered, so no per-call open()/flush() syscalls.
+
+    Lazy form: log_event("INFO", "x=%d", x) only %-formats when the level
+    passes the gate, so disabled messages cost no string building.
     """
+    level = level.upper()
+    if _LEVEL_NUM.get(level, 20) < _MIN_LEVEL_NUM:
+        return
+    if args:
+        msg = msg % args
+
     ts  = _utc_now()
-    ts_iso = ts.isoformat()
 
     payload = {
-        "ts_utc":   ts_iso,
-        "level":    level.upper(),
+        "ts_utc":   ts,   # orjson serialises datetimes as ISO 8601
+        "level":    level,
         "bot":      _BOT_NAME,
         "strategy": cfg.name  if cfg else None,
         "magic":    cfg.magic if cfg else None,
@@ -94,20 +213,27 @@ def log_event(
     _append_jsonl(payload)
 
     # ── Terminal (human-readable, written to real stdout — NOT through Tee)
-    prefix = f"[{ts.strftime('%Y-%m-%d %H:%M:%S')} UTC] [{payload['level']}]"
+    prefix = f"[{_ts_text(ts)} UTC] [{payload['level']}]"
     line   = f"{prefix} [{cfg.name}] {msg}" if cfg else f"{prefix} {msg}"
-    sys.__stdout__.write(line + "\n")
-    sys.__stdout__.flush()
+    _REAL_STDOUT.write(line + "\n")
+
+
+def should_log(level: str = "INFO") -> bool:
+    """
+    True if a message at `level` would be emitted. Use it to guard call
+    sites whose arguments / structured fields are costly to build.
+    """
+    return _LEVEL_NUM.get(level.upper(), 20) >= _MIN_LEVEL_NUM
 
 
-def log(msg: str, level: str = "INFO", **fields) -> None:
-    """Log without strategy context."""
-    log_event(level, msg, cfg=None, **fields)
+def log(msg: str, *args, level: str = "INFO", **fields) -> None:
+    """Log without strategy context. Extra positional args → lazy %-format."""
+    log_event(level, msg, *args, cfg=None, **fields)
 
 
-def log_strategy(cfg: "StrategyConfig", msg: str, level: str = "INFO", **fields) -> None:
+def log_strategy(cfg: "StrategyConfig", msg: str, *args, level: str = "INFO", **fields) -> None:
     """Log with strategy context (name + magic appended)."""
-    log_event(level, msg, cfg=cfg, **fields)
+    log_event(level, msg, *args, cfg=cfg, **fields)
 
 
 # ─────────────────────────────────────────────
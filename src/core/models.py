@@ -7,17 +7,19 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, TYPE_CHECKING
+from typing import Callable, Optional, Dict, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future
     from src.core.cluster_engine import ClusterEngine
+    from src.core.indicators import TrailStats
 
 
 # ─────────────────────────────────────────────
 # SIRIX EVENT
 # ─────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class SirixPositionEvent:
     """One open position observed on SiRiX (de-duplicated by OrderID)."""
     order_id: str
@@ -25,13 +27,20 @@ class SirixPositionEvent:
     side:     str      # "buy" | "sell"
     lots:     float
     time:     datetime  # UTC-aware OpenTime from SiRiX
+    time_ts:  float = field(init=False, repr=False)   # time as epoch seconds
+    side_code: int  = field(init=False, repr=False)   # 0 = buy, 1 = sell
+
+    def __post_init__(self) -> None:
+        # Cached once so hot-path window comparisons are plain float compares
+        self.time_ts   = self.time.timestamp()
+        self.side_code = 0 if self.side == "buy" else 1
 
 
 # ─────────────────────────────────────────────
 # MT5 POSITION TRACKING
 # ─────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class BotPositionInfo:
     """Local snapshot of one open MT5 position managed by this bot."""
     ticket:           int
@@ -43,23 +52,34 @@ class BotPositionInfo:
     initial_sl_price: float          # original SL at entry (never changes)
     trade_mode:       str = "inverse"  # "inverse" | "momentum"
     breakeven_hit:    bool = False   # True once we have moved SL to entry
+    entry_ts:         float = 0.0    # entry_time as UTC epoch seconds (for age gates)
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingOrderMeta:
     """Metadata captured at pending order placement (for fill quality logging)."""
-    created_at_utc: datetime
+    created_ts:     float    # UTC epoch seconds (time.time()) — TTL gate
     trade_side:     str      # "buy" | "sell"
     pending_price:  float    # the LIMIT price we requested
     market_price:   float    # mid-price at placement time
     trade_mode:     str = "inverse"
 
 
+@dataclass(slots=True)
+class PendingRequest:
+    """A fully built (not yet sent) pending-entry order, see build_pending_request."""
+    cfg:  "StrategyConfig"
+    req:  dict               # mt5.order_send request
+    meta: PendingOrderMeta
+    bid:  float              # quote at build time (logging)
+    ask:  float
+
+
 # ─────────────────────────────────────────────
 # STRATEGY CONFIGURATION
 # ─────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class StrategyConfig:
     """
     Full parameter set for one strategy engine.
@@ -117,7 +137,7 @@ class StrategyConfig:
 # STRATEGY RUNTIME STATE
 # ─────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class StrategyState:
     """
     All mutable runtime state for one strategy engine.
@@ -127,14 +147,23 @@ class StrategyState:
     cluster_engine:  "ClusterEngine"
 
     open_positions:  Dict[int, BotPositionInfo]  = field(default_factory=dict)
-    pending_orders:  Dict[int, datetime]          = field(default_factory=dict)  # ticket → created_at
-    pending_meta:    Dict[int, PendingOrderMeta]  = field(default_factory=dict)
+    pending_orders:  Dict[int, PendingOrderMeta]  = field(default_factory=dict)  # ticket → meta (created_ts inside)
+    closing_tickets: Dict[int, "Future"]          = field(default_factory=dict)  # ticket → in-flight close (still in open_positions)
 
-    cooldown_until_utc:          Optional[datetime] = None
+    cooldown_until_ts:           Optional[float]    = None   # UTC epoch seconds
 
     # Internal: used by log_cooldown_state to avoid spam
     _cooldown_active_last:       bool               = False
-    _cooldown_last_heartbeat_utc: Optional[datetime] = None
+    _cooldown_last_heartbeat_ts: Optional[float]    = None
 
     # Internal: equity heartbeat tracking
     _last_equity_heartbeat_utc:  Optional[datetime] = None
+
+    # Internal: streaming ATR / HH / LL for chandelier trailing (lazy)
+    _trail_stats:                Optional["TrailStats"] = None
+    _trail_key:                  Optional[tuple]        = None   # inputs of the last trailing pass
+
+    # Internal: hybrid_params(config) and make_direction_decider(config),
+    # both built once by the loader
+    _hybrid:                     tuple                  = ()
+    _decide_direction:           Optional[Callable[[str], Tuple[str, str]]] = None
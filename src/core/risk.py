@@ -2,23 +2,26 @@
 """
 Risk management:
   1. Lot-size calculation (dynamic_pct / static_pct / fixed_lots).
-  2. Daily PnL aggregation per magic number.
+  2. Daily PnL aggregation per magic number (batched: 2 RPCs for all engines).
   3. Daily loss limit circuit breaker (total + per-engine).
 """
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List, Tuple, TYPE_CHECKING
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AbstractSet, Any, DefaultDict, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
 
 import MetaTrader5 as mt5
+import numpy as np
 
 from config.config import (
     USE_DAILY_LOSS_LIMITS,
     DAILY_LOSS_LIMIT_TOTAL,
     DAILY_LOSS_LIMIT_PER_ENGINE,
-    LOCAL_TZ, MT5_SYMBOL,
+    UTC, LOCAL_TZ, MT5_SYMBOL,
 )
 from src.core.logger import log
+from src.mt5.connection import MT5_LOCK, get_account_cached
 
 if TYPE_CHECKING:
     from src.core.models import StrategyConfig, StrategyState
@@ -49,8 +52,8 @@ def calc_lot_size(
     if cfg.risk_mode == "static_pct":
         risk_dollars = cfg.static_risk_base_balance * cfg.risk_percent
     else:
-        # dynamic_pct — use current equity
-        acct = mt5.account_info()
+        # dynamic_pct — use current equity (this iteration's cached snapshot)
+        acct = get_account_cached()
         if acct is None:
             log("[RISK] account_info() is None — defaulting to vol_min", level="WARN")
             return _round_lots(symbol_info.volume_min, symbol_info)
@@ -64,25 +67,66 @@ def calc_lot_size(
     return _round_lots(raw_lots, symbol_info)
 
 
+# Lots are quoted to 0.01 → the volume grid is handled in integer centi-lots
+_LOT_SCALE = 100
+
+# (symbol_info object, step, vol_min, vol_max) in centi-lots.
+# SYMBOL_INFO is fixed after init_mt5, so an identity check is enough.
+_LOT_GRID: Optional[Tuple[object, int, int, int]] = None
+
+
+def _lot_grid(symbol_info) -> Tuple[int, int, int]:
+    """Broker volume grid as integers: (step, vol_min, vol_max) in centi-lots."""
+    global _LOT_GRID
+
+    grid = _LOT_GRID
+    if grid is None or grid[0] is not symbol_info:
+        grid = _LOT_GRID = (
+            symbol_info,
+            max(round(symbol_info.volume_step * _LOT_SCALE), 1),
+            round(symbol_info.volume_min * _LOT_SCALE),
+            round(symbol_info.volume_max * _LOT_SCALE),
+        )
+    return grid[1], grid[2], grid[3]
+
+
 def _round_lots(lots: float, symbol_info) -> float:
-    """Snap lots to broker volume grid [vol_min, vol_max] in steps of volume_step."""
-    step    = max(symbol_info.volume_step, 0.01)
-    vol_min = symbol_info.volume_min
-    vol_max = symbol_info.volume_max
-    rounded = round(round(lots / step) * step, 2)
-    return max(vol_min, min(rounded, vol_max))
+    """
+    Snap lots to broker volume grid [vol_min, vol_max] in steps of volume_step.
+    Integer snap (one rounding, no FP drift from non-decimal steps).
+    """
+    step, vol_min, vol_max = _lot_grid(symbol_info)
+    n = round(lots * _LOT_SCALE / step) * step
+    return max(vol_min, min(n, vol_max)) / _LOT_SCALE
 
 
 # ─────────────────────────────────────────────
 # DAILY PNL HELPERS
 # ─────────────────────────────────────────────
 
+# Cached [start, next_start) of the current LOCAL_TZ day, both in UTC.
+_DAY_BOUNDS_UTC: Optional[Tuple[datetime, datetime]] = None
+
+
 def _start_of_local_day_utc(now_utc: datetime) -> datetime:
-    """Return UTC equivalent of today's midnight in LOCAL_TZ."""
+    """
+    Return UTC equivalent of today's midnight in LOCAL_TZ.
+    Recomputed only when now_utc leaves the cached day (two comparisons
+    on the hot path instead of an astimezone/replace/astimezone chain).
+    """
+    global _DAY_BOUNDS_UTC
+
+    bounds = _DAY_BOUNDS_UTC
+    if bounds is not None and bounds[0] <= now_utc < bounds[1]:
+        return bounds[0]
+
     local = now_utc.astimezone(LOCAL_TZ)
     local_midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
-    from pytz import timezone
-    return local_midnight.astimezone(timezone("UTC"))
+    start = local_midnight.astimezone(UTC)
+    # Wall-clock +1 day, so DST-change days resolve to the correct UTC instant
+    next_start = (local_midnight + timedelta(days=1)).astimezone(UTC)
+    _DAY_BOUNDS_UTC = (start, next_start)
+    return start
 
 
 def realized_pnl_today(magic: int) -> float:
@@ -90,27 +134,145 @@ def realized_pnl_today(magic: int) -> float:
     Sum of closed-deal profit for this magic since today's local midnight.
     Uses MT5 deal history (DEAL_ENTRY_OUT / OUT_BY only → closing deals).
     """
-    now   = datetime.now(__import__("pytz").timezone("UTC"))
+    now   = datetime.now(UTC)
     start = _start_of_local_day_utc(now)
-    deals = mt5.history_deals_get(start, now)
+    with MT5_LOCK:
+        deals = mt5.history_deals_get(start, now)
     if deals is None:
         return 0.0
 
     return sum(
-        float(getattr(d, "profit", 0.0))
+        d.profit
         for d in deals
-        if getattr(d, "magic",   None) == magic
-        and getattr(d, "entry",  None) in (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY)
+        if d.magic == magic and d.entry in _CLOSING_ENTRIES
     )
 
 
+# Closing-deal entry codes (resolved once)
+_CLOSING_ENTRIES = frozenset((mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY))
+
+# (realized_by_magic, floating_by_magic)
+PnlByMagic = Tuple[Dict[int, float], Dict[int, float]]
+
+
+# ── Incremental realized-PnL cursor (aggregate_pnl_by_magic) ───────────────
+# Deals are fetched from (last query − overlap) instead of local midnight, so
+# each poll only walks recent history. Counted deal tickets are remembered
+# for the day, so the overlap never double-counts; everything resets when
+# the local day rolls over.
+_REALIZED_OVERLAP_SECONDS = 300
+
+_realized_day:    Optional[datetime] = None      # day start the totals belong to
+_realized_from:   Optional[datetime] = None      # next history_deals_get lower bound
+_realized_seen:   Set[int]           = set()     # closing-deal tickets already summed
+_realized_totals: DefaultDict[int, float] = defaultdict(float)   # magic → realized
+
+
+# Large batches (first query of the day / after a restart on a busy day) are
+# summed in NumPy; the usual few-deal incremental batch stays a plain loop,
+# where array construction would cost more than it saves.
+_VECTORIZE_MIN_DEALS = 256
+_CLOSING_ENTRIES_ARR = np.array(sorted(_CLOSING_ENTRIES), dtype=np.int64)
+
+
+def _accumulate_deals_np(
+    deals,
+    totals: DefaultDict[int, float],
+    seen: Set[int],
+) -> None:
+    """Vectorised body of the cursor walk: mask closing/unseen deals, group-sum by magic."""
+    n       = len(deals)
+    tickets = np.fromiter((d.ticket for d in deals), dtype=np.int64,   count=n)
+    entries = np.fromiter((d.entry  for d in deals), dtype=np.int64,   count=n)
+    magics  = np.fromiter((d.magic  for d in deals), dtype=np.int64,   count=n)
+    profits = np.fromiter((d.profit for d in deals), dtype=np.float64, count=n)
+
+    mask = np.isin(entries, _CLOSING_ENTRIES_ARR)
+    if seen:
+        mask &= ~np.isin(tickets, np.fromiter(seen, dtype=np.int64, count=len(seen)))
+    if not mask.any():
+        return
+
+    seen.update(tickets[mask].tolist())
+    uniq, idx = np.unique(magics[mask], return_inverse=True)
+    sums      = np.bincount(idx, weights=profits[mask], minlength=len(uniq))
+    for magic, total in zip(uniq.tolist(), sums.tolist()):
+        totals[magic] += total
+
+
+def _realized_today_by_magic(now: datetime) -> Dict[int, float]:
+    """Advance the deal cursor to `now` and return magic → realized today."""
+    global _realized_day, _realized_from, _realized_totals
+
+    start = _start_of_local_day_utc(now)
+    if _realized_day != start:
+        _realized_day    = start
+        _realized_from   = start
+        _realized_totals = defaultdict(float)
+        _realized_seen.clear()
+
+    with MT5_LOCK:
+        deals = mt5.history_deals_get(_realized_from, now)
+    if deals is None:
+        return _realized_totals   # query failed — keep cursor, retry next poll
+
+    totals, seen = _realized_totals, _realized_seen
+    if len(deals) >= _VECTORIZE_MIN_DEALS:
+        _accumulate_deals_np(deals, totals, seen)
+    else:
+        for d in deals:
+            if d.entry not in _CLOSING_ENTRIES or d.ticket in seen:
+                continue
+            seen.add(d.ticket)
+            totals[d.magic] += d.profit
+
+    _realized_from = max(start, now - timedelta(seconds=_REALIZED_OVERLAP_SECONDS))
+    return totals
+
+
+def aggregate_pnl_by_magic(
+    magics: Optional[AbstractSet[int]] = None,
+    positions: Optional[Iterable[Any]] = None,
+) -> PnlByMagic:
+    """
+    Realized-today and floating PnL for every magic, from ONE
+    history_deals_get + ONE positions_get call (instead of two RPCs per
+    strategy). Same filters as realized_pnl_today / floating_pnl.
+
+    Realized PnL is maintained incrementally (see _realized_today_by_magic):
+    per call, only deals since the previous query (plus a small overlap)
+    are fetched and walked, instead of the whole day's history.
+
+    magics: if given (built once at loop start), deals/positions of other
+    magics — manual trades, other bots — are left out of the result.
+    positions: this iteration's positions_get(symbol=MT5_SYMBOL) snapshot;
+    fetched here if omitted.
+    """
+    totals = _realized_today_by_magic(datetime.now(UTC))
+    if magics is None:
+        realized = dict(totals)
+    else:
+        realized = {m: totals[m] for m in magics if m in totals}
+
+    floating: DefaultDict[int, float] = defaultdict(float)
+    if positions is None:
+        with MT5_LOCK:
+            positions = mt5.positions_get(symbol=MT5_SYMBOL) or ()
+    for p in positions:
+        if magics is None or p.magic in magics:
+            floating[p.magic] += p.profit
+
+    return realized, floating
+
+
 def floating_pnl(magic: int) -> float:
     """Sum of unrealised profit across all open positions for this magic."""
-    poss = mt5.positions_get(symbol=MT5_SYMBOL)
+    with MT5_LOCK:
+        poss = mt5.positions_get(symbol=MT5_SYMBOL)
     if not poss:
         return 0.0
     return sum(
-        float(getattr(p, "profit", 0.0))
+        p.profit
         for p in poss
         if p.magic == magic
     )
@@ -122,6 +284,7 @@ def floating_pnl(magic: int) -> float:
 
 def check_daily_loss_limits(
     strategies: "List[StrategyState]",
+    pnl_by_magic: Optional[PnlByMagic] = None,
 ) -> Tuple[bool, str]:
     """
     Returns (breach: bool, reason: str).
@@ -130,16 +293,20 @@ def check_daily_loss_limits(
       1. Any single engine: realized + floating <= -DAILY_LOSS_LIMIT_PER_ENGINE
       2. All engines combined: total <= -DAILY_LOSS_LIMIT_TOTAL
 
+    pnl_by_magic: result of aggregate_pnl_by_magic() if the caller already
+    fetched it this iteration; otherwise it is fetched here (2 RPCs total).
+
     Called every loop iteration BEFORE placing new orders.
     """
     if not USE_DAILY_LOSS_LIMITS:
         return False, ""
 
+    realized, floating = pnl_by_magic or aggregate_pnl_by_magic()
     total_pnl = 0.0
 
     for st in strategies:
         magic = st.config.magic
-        pnl   = realized_pnl_today(magic) + floating_pnl(magic)
+        pnl   = realized.get(magic, 0.0) + floating.get(magic, 0.0)
         total_pnl += pnl
 
         if pnl <= -DAILY_LOSS_LIMIT_PER_ENGINE:
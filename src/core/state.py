@@ -1,105 +1,186 @@
 # src/core/state.py
 """
 Bot state persistence.
-Writes a human-readable JSON snapshot every loop for external monitoring
-(dashboards, watchdog scripts, etc.).
+Writes a JSON snapshot for external monitoring (dashboards, watchdog
+scripts, etc.) at most every STATE_WRITE_MIN_INTERVAL_SECONDS.
+
+The file is written to a sibling .tmp, fsync'd and os.replace'd onto
+STATE_PATH, so readers never see a partial / zero-byte snapshot.
 """
 from __future__ import annotations
 
-import json
-from typing import List, TYPE_CHECKING
+import io
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Tuple, TYPE_CHECKING
+
+import orjson
 
-from config.config import BOT_NAME, STATE_PATH
+from config.config import (
+    UTC, BOT_NAME, STATE_PATH,
+    STATE_WRITE_MIN_INTERVAL_SECONDS, STATE_PRETTY_JSON,
+)
 from src.core.logger import log
 
 if TYPE_CHECKING:
     from src.core.models import StrategyState
 
 
-def write_state(strategies: "List[StrategyState]") -> None:
+_STATE_TMP_PATH = STATE_PATH.with_suffix(".json.tmp")
+
+# Monotonic time of the last successful write (None → never written)
+_last_write_ts: "float | None" = None
+
+
+def write_state(strategies: "List[StrategyState]", force: bool = False) -> None:
     """
     Dump a JSON snapshot of all strategy states to STATE_PATH.
+    Skipped if the last write was < STATE_WRITE_MIN_INTERVAL_SECONDS ago,
+    unless force=True (flatten / breach events).
     Never raises — logging failures must not crash the bot.
     """
-    try:
-        from pytz import timezone
-        from datetime import datetime
-
-        def utc_now():
-            return datetime.now(timezone("UTC"))
-
-        payload = {
-            "bot_name":   BOT_NAME,
-            "updated_utc": utc_now().isoformat(),
-            "strategies": [],
-        }
-
-        for st in strategies:
-            cfg = st.config
-            ce  = st.cluster_engine
-
-            events_list = list(ce.events)
-            buy_users   = {ev.user_id for ev in events_list if ev.side == "buy"}
-            sell_users  = {ev.user_id for ev in events_list if ev.side == "sell"}
-            last_event  = max((ev.time for ev in events_list), default=None)
-
-            open_pos_list = [
-                {
-                    "ticket":           info.ticket,
-                    "direction":        info.direction,
-                    "trade_mode":       info.trade_mode,
-                    "entry_time_utc":   info.entry_time.isoformat(),
-                    "entry_price":      float(info.entry_price),
-                    "sl_price":         float(info.sl_price),
-                    "initial_sl_price": float(info.initial_sl_price),
-                    "tp_price":         float(info.tp_price) if info.tp_price else None,
-                    "breakeven_hit":    info.breakeven_hit,
-                }
-                for info in st.open_positions.values()
-            ]
-
-            recent_events = [
-                {
-                    "order_id": ev.order_id,
-                    "user_id":  ev.user_id,
-                    "side":     ev.side,
-                    "lots":     ev.lots,
-                    "time_utc": ev.time.isoformat(),
-                }
-                for ev in events_list[-10:]
-            ]
-
-            payload["strategies"].append({
-                "name":  cfg.name,
-                "magic": cfg.magic,
-                "config": {
-                    "t_seconds":       cfg.t_seconds,
-                    "k_unique":        cfg.k_unique,
-                    "stop_mode":       cfg.stop_mode,
-                    "direction_mode":  cfg.direction_mode,
-                    "risk_mode":       cfg.risk_mode,
-                    "risk_percent":    cfg.risk_percent,
-                    "trail_start_R":   cfg.trail_start_R,
-                    "breakeven_R":     cfg.breakeven_trigger_R,
-                },
-                "cluster": {
-                    "window_seconds":          ce.window_seconds,
-                    "events_in_window":        len(events_list),
-                    "unique_buy":              len(buy_users),
-                    "unique_sell":             len(sell_users),
-                    "last_cluster_side":       ce.last_cluster_side,
-                    "last_cluster_time_utc":   ce.last_cluster_time.isoformat() if ce.last_cluster_time else None,
-                    "last_event_time_utc":     last_event.isoformat() if last_event else None,
-                    "recent_events":           recent_events,
-                },
-                "open_positions":  open_pos_list,
-                "pending_orders":  list(st.pending_orders.keys()),
-                "cooldown_until":  st.cooldown_until_utc.isoformat() if st.cooldown_until_utc else None,
-            })
+    global _last_write_ts
 
+    now_mono = time.monotonic()
+    if (
+        not force
+        and _last_write_ts is not None
+        and now_mono - _last_write_ts < STATE_WRITE_MIN_INTERVAL_SECONDS
+    ):
+        return
+
+    try:
         STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with STATE_PATH.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+        with _STATE_TMP_PATH.open("wb") as f:
+            if STATE_PRETTY_JSON:
+                # Debug path: stream to memory, then re-indent
+                buf = io.BytesIO()
+                _stream_snapshot(buf.write, strategies)
+                f.write(orjson.dumps(orjson.loads(buf.getvalue()), option=orjson.OPT_INDENT_2))
+            else:
+                _stream_snapshot(f.write, strategies)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(_STATE_TMP_PATH, STATE_PATH)
+        _last_write_ts = now_mono
 
     except Exception as e:
         log(f"[STATE] Failed to write state: {e}", level="WARN")
+
+
+# ─────────────────────────────────────────────
+# STREAMING WRITER
+# ─────────────────────────────────────────────
+# The snapshot is written straight to the (binary) file: leaf values are
+# encoded by orjson (UTF-8 bytes, datetimes natively as ISO 8601), structure
+# and keys are literal bytes. No nested payload dict is built and then
+# traversed a second time by a serializer.
+
+_enc = orjson.dumps
+
+
+def _write_object(
+    w: Callable[[bytes], Any],
+    fields: Iterable[Tuple[bytes, bytes]],
+    close: bool = True,
+) -> None:
+    """
+    Write {"k":v,... from (b'"k":', already-encoded-value) pairs.
+    close=False leaves the object open so the caller can append members.
+    """
+    w(b"{")
+    sep = b""
+    for key, raw in fields:
+        w(sep); w(key); w(raw)
+        sep = b","
+    if close:
+        w(b"}")
+
+
+def _write_array(w: Callable[[bytes], Any], items: Iterable[Any], write_item) -> None:
+    w(b"[")
+    first = True
+    for item in items:
+        if not first:
+            w(b",")
+        write_item(w, item)
+        first = False
+    w(b"]")
+
+
+def _write_position(w, info) -> None:
+    _write_object(w, (
+        (b'"ticket":',           _enc(info.ticket)),
+        (b'"direction":',        _enc(info.direction)),
+        (b'"trade_mode":',       _enc(info.trade_mode)),
+        (b'"entry_time_utc":',   _enc(info.entry_time)),
+        (b'"entry_price":',      _enc(float(info.entry_price))),
+        (b'"sl_price":',         _enc(float(info.sl_price))),
+        (b'"initial_sl_price":', _enc(float(info.initial_sl_price))),
+        (b'"tp_price":',         _enc(float(info.tp_price)) if info.tp_price else b"null"),
+        (b'"breakeven_hit":',    _enc(info.breakeven_hit)),
+    ))
+
+
+def _write_event(w, ev) -> None:
+    _write_object(w, (
+        (b'"order_id":', _enc(ev.order_id)),
+        (b'"user_id":',  _enc(ev.user_id)),
+        (b'"side":',     _enc(ev.side)),
+        (b'"lots":',     _enc(ev.lots)),
+        (b'"time_utc":', _enc(ev.time)),
+    ))
+
+
+def _write_strategy(w, st: "StrategyState") -> None:
+    cfg = st.config
+    ce  = st.cluster_engine
+    ce.settle()   # exact window counts (trims are deferred between events)
+
+    w(b'{"name":');  w(_enc(cfg.name))
+    w(b',"magic":'); w(_enc(cfg.magic))
+
+    w(b',"config":')
+    _write_object(w, (
+        (b'"t_seconds":',      _enc(cfg.t_seconds)),
+        (b'"k_unique":',       _enc(cfg.k_unique)),
+        (b'"stop_mode":',      _enc(cfg.stop_mode)),
+        (b'"direction_mode":', _enc(cfg.direction_mode)),
+        (b'"risk_mode":',      _enc(cfg.risk_mode)),
+        (b'"risk_percent":',   _enc(cfg.risk_percent)),
+        (b'"trail_start_R":',  _enc(cfg.trail_start_R)),
+        (b'"breakeven_R":',    _enc(cfg.breakeven_trigger_R)),
+    ))
+
+    w(b',"cluster":')
+    _write_object(w, (
+        (b'"window_seconds":',        _enc(ce.window_seconds)),
+        (b'"events_in_window":',      _enc(len(ce))),
+        (b'"unique_buy":',            _enc(ce.buy_unique)),
+        (b'"unique_sell":',           _enc(ce.sell_unique)),
+        (b'"last_cluster_side":',     _enc(ce.last_cluster_side)),
+        (b'"last_cluster_time_utc":', _enc(ce.last_cluster_time)),
+        (b'"last_event_time_utc":',   _enc(ce.last_event_time)),
+    ), close=False)
+    w(b',"recent_events":')
+    _write_array(w, ce.window_events(), _write_event)
+    w(b"}")
+
+    w(b',"open_positions":')
+    _write_array(w, st.open_positions.values(), _write_position)
+
+    w(b',"pending_orders":')
+    _write_array(w, st.pending_orders.keys(), lambda w_, t: w_(_enc(t)))
+
+    until = st.cooldown_until_ts
+    w(b',"cooldown_until":'); w(_enc(None if until is None else datetime.fromtimestamp(until, UTC)))
+    w(b"}")
+
+
+def _stream_snapshot(w: Callable[[bytes], Any], strategies: "List[StrategyState]") -> None:
+    w(b'{"bot_name":');     w(_enc(BOT_NAME))
+    w(b',"updated_utc":');  w(_enc(datetime.now(UTC)))
+    w(b',"strategies":')
+    _write_array(w, strategies, _write_strategy)
+    w(b"}")
@@ -16,27 +16,32 @@ from __future__ import annotations
 
 import sys
 import time
+from concurrent.futures import wait
 from datetime import datetime
-from typing import List, Optional
-
-from pytz import timezone
+from typing import Dict, List, Optional
 
 # ── Bootstrap: logger and config must be imported first ──────────────────────
 from config.config import (
-    BOT_NAME, BOT_KEY, LOG_PATH, STATE_PATH,
-    POLL_INTERVAL_SECONDS, EQUITY_HEARTBEAT_SECONDS,
+    UTC, BOT_NAME, BOT_KEY, LOG_PATH, STATE_PATH, LOG_MIN_LEVEL,
+    POLL_INTERVAL_SECONDS, EQUITY_HEARTBEAT_SECONDS, USE_DAILY_LOSS_LIMITS,
+    MT5_SYMBOL, SIRIX_INSTRUMENT, make_comment,
 )
-from src.core.logger import init_logger, enable_print_capture, log, log_strategy
+from src.core.logger import init_logger, enable_print_capture, log, log_strategy, should_log
 from src.core.models import StrategyState
 from src.core.state import write_state
 from src.core.filters import load_no_trade_zones, check_no_trade_zone
-from src.core.risk import check_daily_loss_limits, floating_pnl, realized_pnl_today
+from src.core.risk import PnlByMagic, aggregate_pnl_by_magic, check_daily_loss_limits
 from src.mt5 import connection as conn
-from src.mt5.execution import refresh_and_log_closes, close_position
+from src.mt5.execution import (
+    refresh_and_log_closes, close_position, close_by, order_send, drain_sends,
+    begin_iteration, bind_symbol,
+    group_positions_by_magic, pair_opposite_positions, place_pending_entries_bulk,
+)
 from src.sirix.api import SeenOrdersCache, fetch_raw_positions, build_new_events
 from src.strategies.loader import load_strategies
 from src.strategies.chandelier import (
     entry_step,
+    record_pending_entry,
     manage_pending_orders,
     manage_trailing_stops,
     manage_time_exits,
@@ -46,7 +51,18 @@ import MetaTrader5 as mt5
 
 
 def _utc_now() -> datetime:
-    return datetime.now(timezone("UTC"))
+    return datetime.now(UTC)
+
+
+def _sleep_rest_of_poll(t0: float) -> None:
+    """
+    Sleep until POLL_INTERVAL_SECONDS after t0 (time.monotonic() at the top of
+    the iteration), so the cadence is POLL rather than POLL + iteration time.
+    Overrunning iterations start the next one immediately.
+    """
+    remaining = POLL_INTERVAL_SECONDS - (time.monotonic() - t0)
+    if remaining > 0:
+        time.sleep(remaining)
 
 
 # ─────────────────────────────────────────────
@@ -57,65 +73,117 @@ def flatten_all(strategies: List[StrategyState], reason: str) -> None:
     """
     Close all open positions and cancel all pending orders across all engines.
     Also clears cluster buffers so we only act on fresh signals after resuming.
+
+    Every terminal call holds MT5_LOCK, so requests go out one at a time
+    (one round-trip each): all cancels first, then the closes. Within an
+    engine, equal-volume buy/sell tickets are netted with one CLOSE_BY deal
+    — one round-trip per pair — and only the residual (or failed pairs) get
+    individual market closes, which are queued on the send pool and
+    awaited together. Cancel failures are logged once per engine.
     """
     log(f"[FLATTEN] {reason}", level="WARN")
 
+    cancels = []
     for st in strategies:
-        cfg = st.config
+        if not st.pending_orders:
+            continue
+        # Constant fields built once per strategy; only "order" varies
+        tpl = {
+            "action":  mt5.TRADE_ACTION_REMOVE,
+            "symbol":  MT5_SYMBOL,
+            "magic":   st.config.magic,
+            "comment": make_comment(f"{st.config.name}_FLT"),
+        }
+        cancels.extend((st, ticket, {**tpl, "order": ticket}) for ticket in st.pending_orders)
+
+    # Cancel pending orders
+    failed: Dict[int, List[int]] = {}
+    for st, ticket, req in cancels:
+        res = order_send(req)
+        if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
+            failed.setdefault(id(st), []).append(ticket)
+        st.pending_orders.pop(ticket, None)
 
-        # Cancel pending orders
-        for ticket in list(st.pending_orders.keys()):
-            from config.config import make_comment
-            req = {
-                "action":  mt5.TRADE_ACTION_REMOVE,
-                "order":   ticket,
-                "symbol":  conn.MT5_SYMBOL if hasattr(conn, "MT5_SYMBOL") else "XAUUSD",
-                "magic":   cfg.magic,
-                "comment": make_comment(f"{cfg.name}_FLT"),
-            }
-            res = mt5.order_send(req)
-            if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
-                log_strategy(cfg, f"[WARN] cancel pending failed ticket={ticket}", level="WARN")
-            st.pending_orders.pop(ticket, None)
-            st.pending_meta.pop(ticket, None)
-
-        # Close open positions
-        for ticket in list(st.open_positions.keys()):
-            close_position(ticket, cfg, reason=reason)
-            st.open_positions.pop(ticket, None)
-
-        # Clear cluster engine so only NEW events trigger entries after resume
-        st.cluster_engine.events.clear()
-        st.cluster_engine.last_cluster_time = None
-        st.cluster_engine.last_cluster_side = None
+    for st in strategies:
+        if id(st) in failed:
+            log_strategy(
+                st.config,
+                f"[WARN] cancel pending failed tickets={failed[id(st)]}",
+                level="WARN",
+            )
+
+    # Close open positions: CLOSE_BY pairs first, then market closes
+    # (both log their own outcome)
+    by_magic = group_positions_by_magic() if any(st.open_positions for st in strategies) else {}
+    singles: List[tuple] = []
+    for st in strategies:
+        own  = by_magic.get(st.config.magic, {})
+        live = [own[t] for t in st.open_positions if t in own]
+        st_pairs, st_rest = pair_opposite_positions(live)
+        for b, s in st_pairs:
+            if not close_by(b, s, st.config, reason=reason):
+                singles.extend(((st, b), (st, s)))
+        singles.extend((st, p) for p in st_rest)
+
+    futs = [close_position(p.ticket, st.config, reason=reason, pos=p) for st, p in singles]
+    wait([f for f in futs if f is not None])
+
+    for st in strategies:
+        st.open_positions.clear()
+        st.closing_tickets.clear()
+
+    # Clear cluster engines so only NEW events trigger entries after resume
+    for st in strategies:
+        st.cluster_engine.reset()
 
 
 # ─────────────────────────────────────────────
 # EQUITY HEARTBEAT
 # ─────────────────────────────────────────────
 
-def _maybe_log_equity(strategies: List[StrategyState], now: datetime) -> None:
-    """Log account equity + per-engine PnL every EQUITY_HEARTBEAT_SECONDS."""
-    if EQUITY_HEARTBEAT_SECONDS <= 0:
+def _equity_heartbeat_due(strategies: List[StrategyState], now: datetime) -> List[StrategyState]:
+    """
+    Strategies whose equity heartbeat (EQUITY_HEARTBEAT_SECONDS) is due now.
+    Empty while INFO is gated off, so no PnL is fetched for a dropped line.
+    """
+    if EQUITY_HEARTBEAT_SECONDS <= 0 or not should_log("INFO"):
+        return []
+    return [
+        st for st in strategies
+        if st._last_equity_heartbeat_utc is None
+        or (now - st._last_equity_heartbeat_utc).total_seconds() >= EQUITY_HEARTBEAT_SECONDS
+    ]
+
+
+def _maybe_log_equity(
+    due: List[StrategyState],
+    now: datetime,
+    pnl_by_magic: PnlByMagic,
+) -> None:
+    """
+    Log account equity + per-engine PnL for the strategies that are due.
+    pnl_by_magic is this iteration's batched PnL (shared with the breaker).
+    """
+    if not due:
         return
 
-    for st in strategies:
-        last = st._last_equity_heartbeat_utc
-        if last is None or (now - last).total_seconds() >= EQUITY_HEARTBEAT_SECONDS:
-            acct = mt5.account_info()
-            if acct is None:
-                continue
-            rpnl = realized_pnl_today(st.config.magic)
-            fpnl = floating_pnl(st.config.magic)
-            log_strategy(
-                st.config,
-                f"[HEARTBEAT] equity={acct.equity:.2f} "
-                f"realized_today={rpnl:+.2f} floating={fpnl:+.2f}",
-                equity=acct.equity,
-                realized_today=rpnl,
-                floating=fpnl,
-            )
-            st._last_equity_heartbeat_utc = now
+    acct = conn.get_account_cached()
+    if acct is None:
+        return
+
+    realized, floating = pnl_by_magic
+    for st in due:
+        rpnl = realized.get(st.config.magic, 0.0)
+        fpnl = floating.get(st.config.magic, 0.0)
+        log_strategy(
+            st.config,
+            "[HEARTBEAT] equity=%.2f realized_today=%+.2f floating=%+.2f",
+            acct.equity, rpnl, fpnl,
+            equity=acct.equity,
+            realized_today=rpnl,
+            floating=fpnl,
+        )
+        st._last_equity_heartbeat_utc = now
 
 
 # ─────────────────────────────────────────────
@@ -123,8 +191,6 @@ def _maybe_log_equity(strategies: List[StrategyState], now: datetime) -> None:
 # ─────────────────────────────────────────────
 
 def run_loop(strategies: List[StrategyState]) -> None:
-    from config.config import MT5_SYMBOL
-
     # No-trade zone state (local to this function)
     ntz_active:     bool               = False
     ntz_reason:     Optional[str]      = None
@@ -134,13 +200,17 @@ def run_loop(strategies: List[StrategyState]) -> None:
     max_t = max(st.config.t_seconds for st in strategies)
     lookback_seconds = max(max_t, 60)
 
+    # ── Magic numbers owned by this bot (filters the batched PnL walk) ──
+    magics = frozenset(st.config.magic for st in strategies)
+
     # ── Bootstrap: mark all current SiRiX orders as already-seen ─────────
     seen = SeenOrdersCache()
     bootstrap_raw = fetch_raw_positions(lookback_seconds)
     bootstrap_ids = {
-        str(p.get("OrderID", ""))
+        oid
         for p in bootstrap_raw
-        if p.get("InstrumentName") == "XAUUSD" and p.get("OrderID")
+        if p.get("InstrumentName") == SIRIX_INSTRUMENT
+        and (oid := str(p.get("OrderID") or ""))
     }
     seen.bootstrap(bootstrap_ids)
 
@@ -159,7 +229,9 @@ def run_loop(strategies: List[StrategyState]) -> None:
     # ── Main loop ─────────────────────────────────────────────────────────
     while True:
         try:
+            t0  = time.monotonic()
             now = _utc_now()
+            begin_iteration()
 
             # ── 0a: MT5 health check ─────────────────────────────────────
             if not conn.ensure_connected():
@@ -167,13 +239,27 @@ def run_loop(strategies: List[StrategyState]) -> None:
                 time.sleep(30)
                 continue
 
-            # ── 0b: Sync positions + manage pending TTL ──────────────────
+            # ── 0b: One positions snapshot for the whole iteration ──────
+            with conn.MT5_LOCK:
+                positions = mt5.positions_get(symbol=MT5_SYMBOL) or ()
+            by_magic  = group_positions_by_magic(positions)
+
+            # ── 0c: Sync positions + manage pending TTL ──────────────────
             for st in strategies:
-                refresh_and_log_closes(st)
+                refresh_and_log_closes(st, by_magic.get(st.config.magic, {}))
                 manage_pending_orders(st)
 
-            # ── 0c: Equity heartbeat ─────────────────────────────────────
-            _maybe_log_equity(strategies, now)
+            # ── 0d: Batched PnL (one deals RPC + the positions snapshot) ─
+            # Only fetched if the breaker is on or a heartbeat is due.
+            due          = _equity_heartbeat_due(strategies, now)
+            pnl_by_magic = (
+                aggregate_pnl_by_magic(magics, positions)
+                if USE_DAILY_LOSS_LIMITS or due else None
+            )
+
+            # ── 0e: Equity heartbeat ─────────────────────────────────────
+            if due:
+                _maybe_log_equity(due, now, pnl_by_magic)
 
             # ── 1: No-trade zone check ────────────────────────────────────
             zones    = load_no_trade_zones()
@@ -186,9 +272,10 @@ def run_loop(strategies: List[StrategyState]) -> None:
                     ntz_entered_at = now
                     log(f"[NTZ] ENTER zone: {ntz_reason} — flattening all exposure", level="WARN")
                     flatten_all(strategies, reason=ntz_reason or "NoTradeZone")
+                    write_state(strategies, force=True)
 
                 write_state(strategies)
-                time.sleep(POLL_INTERVAL_SECONDS)
+                _sleep_rest_of_poll(t0)
                 continue
 
             if ntz_active:
@@ -198,11 +285,11 @@ def run_loop(strategies: List[StrategyState]) -> None:
                 ntz_entered_at = None
 
             # ── 2: Daily loss circuit breaker ─────────────────────────────
-            breach, breach_reason = check_daily_loss_limits(strategies)
+            breach, breach_reason = check_daily_loss_limits(strategies, pnl_by_magic)
             if breach:
                 log(f"[RISK] DAILY LOSS BREACH: {breach_reason}", level="ERROR")
                 flatten_all(strategies, reason=breach_reason)
-                write_state(strategies)
+                write_state(strategies, force=True)
                 log("[RISK] Bot stopped. Manual restart required.", level="ERROR")
                 break
 
@@ -210,19 +297,29 @@ def run_loop(strategies: List[StrategyState]) -> None:
             raw       = fetch_raw_positions(lookback_seconds)
             new_events = build_new_events(raw, seen)
 
-            # ── 4: Entry logic per strategy ───────────────────────────────
-            for st in strategies:
-                entry_step(st, new_events, now)
+            # ── 4: Entry logic per strategy (orders sent in one batch) ───
+            entries = [
+                (st, req) for st in strategies
+                if (req := entry_step(st, new_events, now)) is not None
+            ]
+            if entries:
+                results = place_pending_entries_bulk([req for _, req in entries])
+                for (st, _), result in zip(entries, results):
+                    record_pending_entry(st, result, now)
 
             # ── 5: Position management per strategy ───────────────────────
+            # Time exits first: the tickets they close are parked in
+            # closing_tickets, so trailing sends no modify that could race
+            # the close on the send pool.
             for st in strategies:
-                manage_trailing_stops(st)
-                manage_time_exits(st)
+                own = by_magic.get(st.config.magic, {})
+                manage_time_exits(st, own)
+                manage_trailing_stops(st, own)
 
             # ── 6: State snapshot ─────────────────────────────────────────
             write_state(strategies)
 
-            time.sleep(POLL_INTERVAL_SECONDS)
+            _sleep_rest_of_poll(t0)
 
         except KeyboardInterrupt:
             log("\n[MAIN] KeyboardInterrupt — stopping bot.")
@@ -238,7 +335,7 @@ def run_loop(strategies: List[StrategyState]) -> None:
 
 def main() -> None:
     # 1) Init logger first (so all subsequent log() calls work)
-    init_logger(BOT_NAME, LOG_PATH)
+    init_logger(BOT_NAME, LOG_PATH, LOG_MIN_LEVEL)
     enable_print_capture()
 
     log(f"Log file : {LOG_PATH.resolve()}")
@@ -246,6 +343,7 @@ def main() -> None:
 
     # 2) Connect to MT5
     conn.init_mt5()
+    bind_symbol(conn.SYMBOL_INFO)
 
     # 3) Load strategies from YAML
     strategies = load_strategies(BOT_KEY)
@@ -254,7 +352,9 @@ def main() -> None:
     try:
         run_loop(strategies)
     finally:
-        mt5.shutdown()
+        drain_sends(timeout=10)
+        with conn.MT5_LOCK:
+            mt5.shutdown()
         log("[MT5] Shutdown complete.")
 
 
@@ -6,29 +6,73 @@ Responsibilities:
   - Initialize MT5 terminal and select symbol.
   - Expose SYMBOL_INFO as a module-level global (set on init, never None after that).
   - Provide ensure_connected() for health-check + auto-reconnect in the main loop.
+  - Provide get_account_cached() so one account_info() IPC call serves a
+    whole loop iteration (health check, heartbeat, dynamic_pct sizing).
+  - Own MT5_LOCK, held around every mt5.* call in the bot.
 """
 from __future__ import annotations
 
 import sys
+import threading
 import time
+from typing import Optional, Tuple
 
 import MetaTrader5 as mt5
 
 from config.config import (
     MT5_LOGIN, MT5_PASSWORD, MT5_SERVER, MT5_TERMINAL_PATH, MT5_SYMBOL,
     MT5_MAX_RECONNECT_ATTEMPTS, MT5_RECONNECT_WAIT_SECONDS,
+    MT5_RECONNECT_MAX_WAIT_SECONDS, POLL_INTERVAL_SECONDS,
 )
 from src.core.logger import log
 
+# ── Terminal lock ───────────────────────────────────────────────────────────
+# The MetaTrader5 module is a single IPC link and is not reentrant. Every
+# mt5.* call — main loop and send pool alike — is made holding this lock
+# (read mt5.last_error() under the same hold as the call it describes).
+# Reentrant, so locked helpers can nest.
+MT5_LOCK = threading.RLock()
+
 # ── Module-level symbol info (filled by init_mt5, never None after that) ─────
 SYMBOL_INFO = None
 
+# ── account_info() cache: (monotonic fetch time, AccountInfo) ───────────────
+# TTL is below one poll interval, so each iteration sees a fresh snapshot.
+_ACCOUNT_CACHE_TTL_SECONDS = min(0.5, POLL_INTERVAL_SECONDS / 2)
+_ACCOUNT_CACHE: Optional[Tuple[float, object]] = None
+
+
+def _fetch_account():
+    """Call mt5.account_info() and cache the result (None clears the cache)."""
+    global _ACCOUNT_CACHE
+    with MT5_LOCK:
+        acct = mt5.account_info()
+    _ACCOUNT_CACHE = (time.monotonic(), acct) if acct is not None else None
+    return acct
+
+
+def get_account_cached(ttl: float = _ACCOUNT_CACHE_TTL_SECONDS):
+    """
+    Return mt5.account_info(), reusing the last result if it is < ttl old.
+    Returns None if the terminal reports no account (not cached).
+    """
+    cached = _ACCOUNT_CACHE
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    return _fetch_account()
+
 
 def init_mt5() -> None:
     """
     Connect to MT5 terminal, verify account, select symbol.
     Exits the process on failure — no point running without a live connection.
     """
+    with MT5_LOCK:
+        _init_mt5_locked()
+
+
+def _init_mt5_locked() -> None:
+    """init_mt5 body (caller holds MT5_LOCK)."""
     global SYMBOL_INFO
 
     if not mt5.initialize(
@@ -77,25 +121,38 @@ def ensure_connected() -> bool:
     If MT5 has disconnected, attempts to reconnect up to
     MT5_MAX_RECONNECT_ATTEMPTS times before returning False.
 
+    The first attempt re-runs mt5.initialize() on the existing terminal
+    link (idempotent — cheap recovery from a missed heartbeat). Only later
+    attempts tear the link down with shutdown(), waiting an exponential
+    backoff of MT5_RECONNECT_WAIT_SECONDS · 2^(n-2), capped at
+    MT5_RECONNECT_MAX_WAIT_SECONDS.
+
     Returns True  → connection OK (or successfully restored)
     Returns False → reconnect failed (caller should halt trading)
     """
-    if mt5.account_info() is not None:
-        return True   # already connected — fast path
+    if _fetch_account() is not None:
+        return True   # already connected — fast path (also primes the cache)
 
     log("[MT5] Connection lost — attempting reconnect …", level="WARN")
 
     for attempt in range(1, MT5_MAX_RECONNECT_ATTEMPTS + 1):
-        mt5.shutdown()
-        time.sleep(MT5_RECONNECT_WAIT_SECONDS)
-
-        if mt5.initialize(
-            login=MT5_LOGIN,
-            password=MT5_PASSWORD,
-            server=MT5_SERVER,
-            path=MT5_TERMINAL_PATH,
-        ):
-            if mt5.account_info() is not None:
+        if attempt > 1:
+            with MT5_LOCK:
+                mt5.shutdown()
+            time.sleep(min(
+                MT5_RECONNECT_MAX_WAIT_SECONDS,
+                MT5_RECONNECT_WAIT_SECONDS * 2 ** (attempt - 2),
+            ))
+
+        with MT5_LOCK:
+            ok = mt5.initialize(
+                login=MT5_LOGIN,
+                password=MT5_PASSWORD,
+                server=MT5_SERVER,
+                path=MT5_TERMINAL_PATH,
+            )
+        if ok:
+            if _fetch_account() is not None:
                 log(f"[MT5] Reconnected on attempt {attempt}")
                 return True
 
@@ -3,23 +3,36 @@
 All MT5 order execution and position management.
 
 Functions:
-  place_pending_entry()        — place a BUY_LIMIT or SELL_LIMIT
+  order_send() / submit_async()— serialised sync / pooled async order_send
+  close_in_flight()            — whether an async close may still land
+  begin_iteration() / get_tick() — symbol_info_tick shared per loop pass
+  build_pending_request()      — build (not send) a BUY_LIMIT / SELL_LIMIT
+  submit_pending_request()     — send a built entry, log the result
+  place_pending_entry()        — build + send one entry
+  place_pending_entries_bulk() — send all entries built this tick, back to back
   close_position()             — market-close a position by ticket
+  pair_opposite_positions()    — match equal-volume buy/sell tickets for close_by
+  close_by()                   — net two opposite positions in one deal
   modify_sl_tp()               — update SL/TP on a live position
   get_positions_for_strategy() — snapshot of live positions by magic
+  group_positions_by_magic()   — one positions_get snapshot → magic → ticket → pos
   refresh_and_log_closes()     — diff prev vs current positions; log fills and closes
   infer_close_reason()         — look up close reason from MT5 deal history
 """
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple, TYPE_CHECKING
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
 
 import MetaTrader5 as mt5
+import numpy as np
 
-from config.config import MT5_SYMBOL, make_comment
-from src.core.models import BotPositionInfo, PendingOrderMeta
-from src.core.logger import log, log_strategy
+from config.config import UTC, MT5_SYMBOL, TRADE_COOLDOWN_SECONDS, make_comment
+from src.core.models import BotPositionInfo, PendingOrderMeta, PendingRequest
+from src.core.logger import log, log_strategy, should_log
 from src.core.risk import calc_lot_size
 from src.core.indicators import fetch_m1_rates, compute_atr
 import src.mt5.connection as conn
@@ -27,25 +40,172 @@ import src.mt5.connection as conn
 if TYPE_CHECKING:
     from src.core.models import StrategyConfig, StrategyState
 
+# magic → {ticket: raw MT5 position}, built once per main-loop iteration
+PositionsByMagic = Dict[int, Dict[int, Any]]
+
 # ── Tracks reasons for positions closed by our own code ─────────────────────
 # Consumed by refresh_and_log_closes() to avoid re-querying history.
 RECENT_CLOSED_REASONS: Dict[int, str] = {}
 
 
+# ─────────────────────────────────────────────
+# ORDER SUBMISSION  (sync + async)
+# ─────────────────────────────────────────────
+# The terminal API is not reentrant: order_send (like every other mt5.* call
+# in the bot) holds conn.MT5_LOCK. submit_async() runs it on a small shared
+# pool so the strategy loop doesn't wait on the round-trip for closes / SL
+# modifies — its own terminal calls queue on the lock meanwhile.
+
+_SEND_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mt5-send")
+_IN_FLIGHT: Set[Future] = set()
+
+
+def order_send(req: dict):
+    """Serialised mt5.order_send (safe to call from any thread)."""
+    with conn.MT5_LOCK:
+        return mt5.order_send(req)
+
+
+def submit_async(req: dict, on_result: Optional[Callable[[Any], None]] = None) -> Future:
+    """
+    Dispatch order_send(req) on the send pool and return its Future.
+    on_result(res) runs on completion (res is None if the call raised).
+    """
+    fut = _SEND_POOL.submit(order_send, req)
+    _IN_FLIGHT.add(fut)
+
+    def _done(f: Future) -> None:
+        _IN_FLIGHT.discard(f)
+        if on_result is None:
+            return
+        try:
+            res = None if f.exception() is not None else f.result()
+            on_result(res)
+        except Exception as e:
+            log(f"[EXEC] order result callback failed: {e}", level="WARN")
+
+    fut.add_done_callback(_done)
+    return fut
+
+
+def close_in_flight(fut: Future) -> bool:
+    """True while a submitted close may still take its position out (pending or DONE)."""
+    if not fut.done():
+        return True
+    if fut.exception() is not None:
+        return False
+    res = fut.result()
+    return res is not None and res.retcode == mt5.TRADE_RETCODE_DONE
+
+
+def drain_sends(timeout: Optional[float] = None) -> None:
+    """Wait for in-flight async sends (call before mt5.shutdown())."""
+    if _IN_FLIGHT:
+        wait(_IN_FLIGHT.copy(), timeout=timeout)   # copy: callbacks mutate the set
+
+
+# ─────────────────────────────────────────────
+# PER-ITERATION TICK CACHE
+# ─────────────────────────────────────────────
+# Every engine placing/closing in the same loop pass shares one
+# symbol_info_tick() IPC call. The entry is keyed by the main loop's
+# iteration id and additionally expires after _TICK_MAX_AGE_SECONDS, so a
+# long iteration (e.g. a flatten) never prices a market close off an old quote.
+
+_TICK_MAX_AGE_SECONDS = 0.25
+_ITER_ID:    int = 0
+_TICK_CACHE: Optional[Tuple[int, float, Any]] = None   # (iter_id, monotonic, tick)
+
+
+def begin_iteration() -> None:
+    """Mark the start of a main-loop pass (invalidates the tick/ATR caches)."""
+    global _ITER_ID
+    _ITER_ID += 1
+
+
+def get_tick():
+    """mt5.symbol_info_tick(MT5_SYMBOL), shared within one loop iteration."""
+    global _TICK_CACHE
+    now    = time.monotonic()
+    cached = _TICK_CACHE
+    if (
+        cached is not None
+        and cached[0] == _ITER_ID
+        and now - cached[1] < _TICK_MAX_AGE_SECONDS
+    ):
+        return cached[2]
+    with conn.MT5_LOCK:
+        tick = mt5.symbol_info_tick(MT5_SYMBOL)
+    _TICK_CACHE = (_ITER_ID, now, tick) if tick is not None else None
+    return tick
+
+
+# ATR inputs only move on a new M1 bar, so engines sharing (bars, atr_period)
+# reuse one copy_rates + compute_atr per loop iteration.
+_ATR_CACHE: Dict[Tuple[int, int], Tuple[int, Optional[float]]] = {}   # (bars, period) → (iter_id, atr)
+
+
+def get_atr_cached(bars: int, period: int) -> Optional[float]:
+    """
+    compute_atr over the last `bars` M1 bars, shared within one loop iteration.
+    None if the ATR is not finite (empty / NaN bars) — callers then use the
+    fixed sl_distance fallback.
+    """
+    key    = (bars, period)
+    cached = _ATR_CACHE.get(key)
+    if cached is not None and cached[0] == _ITER_ID:
+        return cached[1]
+    atr_val = compute_atr(fetch_m1_rates(MT5_SYMBOL, bars=bars), period)
+    if not math.isfinite(atr_val):
+        atr_val = None
+    _ATR_CACHE[key] = (_ITER_ID, atr_val)
+    return atr_val
+
+
 # ─────────────────────────────────────────────
 # PRICE / LOT HELPERS  (need SYMBOL_INFO)
 # ─────────────────────────────────────────────
+# Symbol precision is snapshotted once by bind_symbol() (called right after
+# init_mt5), so the helpers below don't chase conn.SYMBOL_INFO or rebuild a
+# format spec on every call.
+
+_DIGITS:    int   = 2
+_SCALE:     float = 100.0
+_FMT_PRICE: str   = "{:.2f}"
+_FMT_DELTA: str   = "{:+.2f}"
+
+
+def bind_symbol(symbol_info) -> None:
+    """Cache digits-derived constants from SYMBOL_INFO (call after init_mt5)."""
+    global _DIGITS, _SCALE, _FMT_PRICE, _FMT_DELTA
+    _DIGITS    = int(symbol_info.digits)
+    _SCALE     = float(10 ** _DIGITS)
+    _FMT_PRICE = f"{{:.{_DIGITS}f}}"
+    _FMT_DELTA = f"{{:+.{_DIGITS}f}}"
+    _SL_TP_CALCS.clear()   # calculators capture the symbol's stop level
+
 
 def round_price(x: float) -> float:
-    return round(float(x), conn.SYMBOL_INFO.digits)
+    """
+    Round half-up to the symbol's digits (one floor on the scaled value).
+    NaN / inf pass through unchanged, as with round(x, digits).
+    """
+    if not math.isfinite(x):
+        return x
+    return math.floor(x * _SCALE + 0.5) / _SCALE
+
+
+def round_prices(x: np.ndarray) -> np.ndarray:
+    """Array form of round_price (same floor-on-scaled rule, elementwise)."""
+    return np.floor(x * _SCALE + 0.5) / _SCALE
 
 
 def fmt_price(x: float) -> str:
-    return f"{float(x):.{conn.SYMBOL_INFO.digits}f}"
+    return _FMT_PRICE.format(float(x))
 
 
 def fmt_delta(x: float) -> str:
-    return f"{x:+.{conn.SYMBOL_INFO.digits}f}"
+    return _FMT_DELTA.format(x)
 
 
 def enforce_stop_level(order_type: int, price: float, sl: float, tp: Optional[float]):
@@ -74,6 +234,57 @@ def enforce_stop_level(order_type: int, price: float, sl: float, tp: Optional[fl
     return sl, tp
 
 
+SlTpCalculator = Callable[[str, float, Optional[float]], Tuple[float, Optional[float]]]
+
+# magic → specialised calculator (built on first use; cleared by bind_symbol)
+_SL_TP_CALCS: Dict[int, SlTpCalculator] = {}
+
+
+def make_sl_tp_calculator(cfg: "StrategyConfig", symbol_info) -> SlTpCalculator:
+    """
+    Specialise calc_sl_tp for one strategy: stop_mode, use_tp_exit and the
+    broker stop level are fixed per cfg, so they are resolved here once and
+    the returned (side, entry, atr) -> (sl, tp) closure only does the maths.
+
+    Stop-level widening is folded in as max(dist, min_dist), which matches
+    enforce_stop_level() for SL/TP placed on the protective side of entry.
+    """
+    stops    = getattr(symbol_info, "trade_stops_level", 0) or 0
+    min_dist = stops * symbol_info.point if stops > 0 else 0.0
+    fixed    = cfg.sl_distance
+    init_m   = cfg.atr_init_mult
+    tp_r     = cfg.tp_R_multiple
+
+    if cfg.stop_mode == "fixed":
+        sl_d = max(fixed, min_dist)
+        if cfg.use_tp_exit:
+            tp_d = max(tp_r * fixed, min_dist)
+
+            def calc(side, entry, atr):
+                if side == "buy":
+                    return round_price(entry - sl_d), round_price(entry + tp_d)
+                return round_price(entry + sl_d), round_price(entry - tp_d)
+        else:
+            def calc(side, entry, atr):
+                return round_price(entry - sl_d if side == "buy" else entry + sl_d), None
+        return calc
+
+    # ATR-based modes (fixed sl_distance if the ATR fetch failed)
+    if cfg.use_tp_exit:
+        def calc(side, entry, atr):
+            d    = fixed if atr is None else init_m * atr
+            sl_d = max(d, min_dist)
+            tp_d = max(tp_r * d, min_dist)
+            if side == "buy":
+                return round_price(entry - sl_d), round_price(entry + tp_d)
+            return round_price(entry + sl_d), round_price(entry - tp_d)
+    else:
+        def calc(side, entry, atr):
+            sl_d = max(fixed if atr is None else init_m * atr, min_dist)
+            return round_price(entry - sl_d if side == "buy" else entry + sl_d), None
+    return calc
+
+
 def calc_sl_tp(
     side: str,
     entry_price: float,
@@ -81,46 +292,37 @@ def calc_sl_tp(
     atr_val: Optional[float],
 ) -> Tuple[float, Optional[float]]:
     """
-    Compute initial SL and TP prices from ATR (or fixed fallback).
+    Compute initial SL and TP prices from ATR (or fixed fallback), with the
+    broker stop level enforced. Dispatches to the cfg's specialised calculator.
     """
-    if cfg.stop_mode == "fixed" or atr_val is None:
-        sl_dist = cfg.sl_distance
-    else:
-        sl_dist = cfg.atr_init_mult * atr_val
-
-    sl = entry_price - sl_dist if side == "buy" else entry_price + sl_dist
-
-    tp = None
-    if cfg.use_tp_exit:
-        tp_dist = cfg.tp_R_multiple * sl_dist
-        tp = entry_price + tp_dist if side == "buy" else entry_price - tp_dist
-
-    order_type = mt5.ORDER_TYPE_BUY if side == "buy" else mt5.ORDER_TYPE_SELL
-    sl, tp = enforce_stop_level(order_type, entry_price, sl, tp)
-    return sl, tp
+    calc = _SL_TP_CALCS.get(cfg.magic)
+    if calc is None:
+        calc = _SL_TP_CALCS[cfg.magic] = make_sl_tp_calculator(cfg, conn.SYMBOL_INFO)
+    return calc(side, entry_price, atr_val)
 
 
 # ─────────────────────────────────────────────
 # PLACE PENDING ENTRY
 # ─────────────────────────────────────────────
 
-def place_pending_entry(
+def build_pending_request(
     trade_side: str,
     cfg: "StrategyConfig",
     offset_dollars: float,
     trade_mode: str = "inverse",
-) -> Optional[Tuple[int, PendingOrderMeta]]:
+) -> Optional[PendingRequest]:
     """
-    Place a BUY_LIMIT or SELL_LIMIT at a slight offset from current price.
+    Build (don't send) a BUY_LIMIT or SELL_LIMIT at a slight offset from
+    current price: tick, ATR-based SL/TP, lot size, stop-level checks.
 
     trade_side = "buy"  → BUY_LIMIT  @ bid − offset_dollars  (cheaper entry)
     trade_side = "sell" → SELL_LIMIT @ ask + offset_dollars  (higher entry for sell)
 
     trade_mode: "inverse" | "momentum"  — logged only, no execution difference.
 
-    Returns (ticket, PendingOrderMeta) on success, None on failure.
+    Returns a PendingRequest, or None if the entry can't be built.
     """
-    tick = mt5.symbol_info_tick(MT5_SYMBOL)
+    tick = get_tick()
 
     # ── Tick fallback ──────────────────────────────────────────────────────
     if tick is None or tick.bid <= 0 or tick.ask <= 0:
@@ -154,9 +356,8 @@ def place_pending_entry(
     atr_val = None
     if cfg.stop_mode in ("atr_static", "atr_trailing", "chandelier"):
         try:
-            bars  = max(cfg.atr_period + 20, (cfg.chan_lookback or 0) + 5)
-            df    = fetch_m1_rates(MT5_SYMBOL, bars=bars)
-            atr_val = compute_atr(df, cfg.atr_period)
+            bars    = max(cfg.atr_period + 20, (cfg.chan_lookback or 0) + 5)
+            atr_val = get_atr_cached(bars, cfg.atr_period)
         except Exception as e:
             log_strategy(cfg, f"[WARN] ATR fetch failed: {e} — using fixed sl_distance", level="WARN")
 
@@ -168,10 +369,6 @@ def place_pending_entry(
         log_strategy(cfg, "[ERROR] Lot size <= 0 — skipping entry", level="ERROR")
         return None
 
-    # Enforce stop level relative to entry price
-    base_type           = mt5.ORDER_TYPE_BUY if trade_side == "buy" else mt5.ORDER_TYPE_SELL
-    sl_price, tp_price  = enforce_stop_level(base_type, entry_price, sl_price, tp_price)
-
     req = {
         "action":      mt5.TRADE_ACTION_PENDING,
         "symbol":      MT5_SYMBOL,
@@ -187,10 +384,28 @@ def place_pending_entry(
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    res = mt5.order_send(req)
+    meta = PendingOrderMeta(
+        created_ts=time.time(),
+        trade_side=trade_side,
+        pending_price=float(entry_price),
+        market_price=float(market_price),
+        trade_mode=trade_mode,
+    )
+    return PendingRequest(cfg=cfg, req=req, meta=meta, bid=bid, ask=ask)
+
+
+def submit_pending_request(p: PendingRequest) -> Optional[Tuple[int, PendingOrderMeta]]:
+    """
+    Send a built pending entry and log the outcome.
+    Returns (ticket, PendingOrderMeta) on success, None on failure.
+    """
+    cfg, req, meta = p.cfg, p.req, p.meta
+    with conn.MT5_LOCK:   # last_error must belong to this send
+        res = mt5.order_send(req)
+        err = mt5.last_error() if res is None else None
 
     if res is None:
-        code, msg = mt5.last_error()
+        code, msg = err
         log_strategy(cfg, f"[ERROR] place_pending: order_send=None, last_error={code} {msg}", level="ERROR")
         return None
 
@@ -203,23 +418,25 @@ def place_pending_entry(
         )
         return None
 
-    meta = PendingOrderMeta(
-        created_at_utc=datetime.now(__import__("pytz").timezone("UTC")),
-        trade_side=trade_side,
-        pending_price=float(entry_price),
-        market_price=float(market_price),
-        trade_mode=trade_mode,
-    )
+    meta.created_ts = time.time()   # placement confirmed now
+    trade_side, trade_mode = meta.trade_side, meta.trade_mode
+    market_price, entry_price = meta.market_price, req["price"]
+    sl_price, tp_price, lots  = req["sl"], (req["tp"] or None), req["volume"]
+    bid, ask = p.bid, p.ask
 
     ticket = res.order
+    if not should_log():
+        return ticket, meta
+
+    d = _DIGITS
     log_strategy(
         cfg,
-        f"[OK] PENDING {trade_side.upper()} [{trade_mode}] "
-        f"mkt={fmt_price(market_price)} "
-        f"bid={fmt_price(bid)} ask={fmt_price(ask)} "
-        f"entry={fmt_price(entry_price)} SL={fmt_price(sl_price)} "
-        f"TP={fmt_price(tp_price) if tp_price else 'None'} "
-        f"lots={lots:.2f} ticket={ticket}",
+        "[OK] PENDING %s [%s] mkt=%.*f bid=%.*f ask=%.*f entry=%.*f SL=%.*f "
+        "TP=%s lots=%.2f ticket=%s",
+        trade_side.upper(), trade_mode,
+        d, market_price, d, bid, d, ask, d, entry_price, d, sl_price,
+        fmt_price(tp_price) if tp_price else "None",
+        lots, ticket,
         trade_side=trade_side,
         trade_mode=trade_mode,
         market_price=market_price,
@@ -232,28 +449,75 @@ def place_pending_entry(
     return ticket, meta
 
 
+def place_pending_entry(
+    trade_side: str,
+    cfg: "StrategyConfig",
+    offset_dollars: float,
+    trade_mode: str = "inverse",
+) -> Optional[Tuple[int, PendingOrderMeta]]:
+    """
+    Build + send one pending entry (see build_pending_request).
+    Returns (ticket, PendingOrderMeta) on success, None on failure.
+    """
+    p = build_pending_request(trade_side, cfg, offset_dollars, trade_mode)
+    return submit_pending_request(p) if p is not None else None
+
+
+def place_pending_entries_bulk(
+    requests: List[PendingRequest],
+) -> List[Optional[Tuple[int, PendingOrderMeta]]]:
+    """
+    Send every pending entry built this tick, in input order, on the
+    calling thread. All requests are built (priced off the same tick)
+    before the first send, so the sends go out back to back; they bypass
+    the send pool so fresh limit orders never queue behind async closes
+    and SL modifies.
+    """
+    return [submit_pending_request(p) for p in requests]
+
+
 # ─────────────────────────────────────────────
 # CLOSE POSITION
 # ─────────────────────────────────────────────
 
-def close_position(ticket: int, cfg: "StrategyConfig", reason: str = "Exit") -> None:
+def _find_position(ticket: int, magic: int):
+    """Live MT5 position by ticket + magic (None if gone)."""
+    with conn.MT5_LOCK:
+        poss = mt5.positions_get(ticket=ticket)
+    if poss:
+        for p in poss:
+            if p.magic == magic:
+                return p
+    return None
+
+
+def close_position(
+    ticket: int,
+    cfg: "StrategyConfig",
+    reason: str = "Exit",
+    pos=None,
+) -> "Optional[Future]":
     """
     Market-close a specific MT5 position by ticket + magic validation.
     Records the reason in RECENT_CLOSED_REASONS so it doesn't get
     double-looked-up via history.
+
+    The close is sent asynchronously (submit_async). The reason is recorded
+    before the send, so refresh_and_log_closes can never see the position
+    gone without it; the completion callback logs the outcome and drops
+    the reason again if the close failed. Returns the Future (None if
+    nothing was sent) — flatten_all waits on it, time exits don't.
+
+    pos: the raw position from this iteration's snapshot, if the caller
+    has it — skips the lookup round-trip.
     """
-    poss = mt5.positions_get()
-    pos  = None
-    if poss:
-        for p in poss:
-            if p.ticket == ticket and p.magic == cfg.magic:
-                pos = p
-                break
+    if pos is None:
+        pos = _find_position(ticket, cfg.magic)
     if pos is None:
         return  # already gone
 
     action = mt5.ORDER_TYPE_SELL if pos.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
-    tick   = mt5.symbol_info_tick(MT5_SYMBOL)
+    tick   = get_tick()
     if tick is None:
         log_strategy(cfg, f"[ERROR] No tick when closing ticket={ticket}", level="ERROR")
         return
@@ -274,23 +538,89 @@ def close_position(ticket: int, cfg: "StrategyConfig", reason: str = "Exit") ->
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    res = mt5.order_send(req)
+    def _on_result(res) -> None:
+        if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
+            RECENT_CLOSED_REASONS.pop(ticket, None)
+            log_strategy(
+                cfg,
+                f"[ERROR] close_position failed ticket={ticket} "
+                f"retcode={getattr(res,'retcode',None)}",
+                level="ERROR",
+                ticket=ticket,
+                retcode=getattr(res, "retcode", None),
+            )
+        else:
+            log_strategy(
+                cfg,
+                f"[OK] Closed ticket={ticket} @ {fmt_price(price)} reason={reason}",
+                ticket=ticket, price=price, reason=reason,
+            )
+
+    RECENT_CLOSED_REASONS[ticket] = reason
+    return submit_async(req, _on_result)
+
+
+def pair_opposite_positions(positions: Iterable[Any]) -> Tuple[List[Tuple[Any, Any]], List[Any]]:
+    """
+    Split raw MT5 positions (one magic) into (buy, sell) pairs of equal
+    volume — closable with one TRADE_ACTION_CLOSE_BY each — and the
+    unpaired residual, which needs a normal market close.
+    """
+    sells_by_vol: Dict[float, List[Any]] = {}
+    buys: List[Any] = []
+    for p in positions:
+        if p.type == mt5.POSITION_TYPE_BUY:
+            buys.append(p)
+        else:
+            sells_by_vol.setdefault(p.volume, []).append(p)
+
+    pairs: List[Tuple[Any, Any]] = []
+    residual: List[Any] = []
+    for b in buys:
+        bucket = sells_by_vol.get(b.volume)
+        if bucket:
+            pairs.append((b, bucket.pop()))
+        else:
+            residual.append(b)
+    for bucket in sells_by_vol.values():
+        residual.extend(bucket)
+    return pairs, residual
+
+
+def close_by(pos, pos_by, cfg: "StrategyConfig", reason: str = "Exit") -> bool:
+    """
+    Close two opposite positions of equal volume against each other
+    (hedging accounts): one deal, no spread crossed, one round-trip.
+    Returns False on failure so the caller can fall back to close_position.
+    """
+    req = {
+        "action":      mt5.TRADE_ACTION_CLOSE_BY,
+        "symbol":      MT5_SYMBOL,
+        "position":    pos.ticket,
+        "position_by": pos_by.ticket,
+        "magic":       cfg.magic,
+        "comment":     make_comment(f"{cfg.name}_{reason}"),
+    }
+    res = order_send(req)
     if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
         log_strategy(
             cfg,
-            f"[ERROR] close_position failed ticket={ticket} "
-            f"retcode={getattr(res,'retcode',None)}",
-            level="ERROR",
-            ticket=ticket,
+            f"[WARN] close_by failed ticket={pos.ticket} by={pos_by.ticket} "
+            f"retcode={getattr(res,'retcode',None)} — falling back to market close",
+            level="WARN",
+            ticket=pos.ticket, ticket_by=pos_by.ticket,
             retcode=getattr(res, "retcode", None),
         )
-    else:
-        RECENT_CLOSED_REASONS[ticket] = reason
-        log_strategy(
-            cfg,
-            f"[OK] Closed ticket={ticket} @ {fmt_price(price)} reason={reason}",
-            ticket=ticket, price=price, reason=reason,
-        )
+        return False
+
+    RECENT_CLOSED_REASONS[pos.ticket]    = reason
+    RECENT_CLOSED_REASONS[pos_by.ticket] = reason
+    log_strategy(
+        cfg,
+        f"[OK] Closed ticket={pos.ticket} by ticket={pos_by.ticket} reason={reason}",
+        ticket=pos.ticket, ticket_by=pos_by.ticket, reason=reason,
+    )
+    return True
 
 
 # ─────────────────────────────────────────────
@@ -302,15 +632,15 @@ def modify_sl_tp(
     cfg: "StrategyConfig",
     new_sl: float,
     new_tp: Optional[float],
-) -> None:
-    """Send a TRADE_ACTION_SLTP request to update SL and/or TP."""
-    poss = mt5.positions_get()
-    pos  = None
-    if poss:
-        for p in poss:
-            if p.ticket == ticket and p.magic == cfg.magic:
-                pos = p
-                break
+    pos=None,
+) -> "Optional[Future]":
+    """
+    Send a TRADE_ACTION_SLTP request to update SL and/or TP.
+    pos: snapshot position if the caller has it (skips the lookup).
+    Fire-and-forget: the outcome is logged from the completion callback.
+    """
+    if pos is None:
+        pos = _find_position(ticket, cfg.magic)
     if pos is None:
         return
 
@@ -323,40 +653,61 @@ def modify_sl_tp(
         "magic":    cfg.magic,
         "comment":  make_comment(f"{cfg.name}_SLmod"),
     }
-    res = mt5.order_send(req)
 
-    if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
-        log_strategy(
-            cfg,
-            f"[WARN] modify_sl_tp failed ticket={ticket} "
-            f"retcode={getattr(res,'retcode',None)}",
-            level="WARN", ticket=ticket,
-        )
-    else:
-        log_strategy(
-            cfg,
-            f"[OK] SL moved ticket={ticket} → SL={fmt_price(new_sl)} "
-            f"TP={fmt_price(new_tp) if new_tp else 'None'}",
-            ticket=ticket, new_sl=new_sl, new_tp=new_tp,
-        )
+    def _on_result(res) -> None:
+        if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
+            log_strategy(
+                cfg,
+                f"[WARN] modify_sl_tp failed ticket={ticket} "
+                f"retcode={getattr(res,'retcode',None)}",
+                level="WARN", ticket=ticket,
+            )
+        else:
+            log_strategy(
+                cfg,
+                f"[OK] SL moved ticket={ticket} → SL={fmt_price(new_sl)} "
+                f"TP={fmt_price(new_tp) if new_tp else 'None'}",
+                ticket=ticket, new_sl=new_sl, new_tp=new_tp,
+            )
+
+    return submit_async(req, _on_result)
 
 
 # ─────────────────────────────────────────────
 # POSITION SNAPSHOT
 # ─────────────────────────────────────────────
 
-def get_positions_for_strategy(cfg: "StrategyConfig") -> Dict[int, BotPositionInfo]:
-    """Return all live MT5 positions matching this strategy's magic number."""
-    poss   = mt5.positions_get(symbol=MT5_SYMBOL)
+def group_positions_by_magic(positions: Optional[Iterable[Any]] = None) -> PositionsByMagic:
+    """
+    Group one positions_get(symbol=MT5_SYMBOL) snapshot by magic → ticket.
+    Called once per main-loop iteration; the per-magic dicts are passed to
+    refresh / trailing / time-exit steps so they don't re-query MT5.
+    """
+    if positions is None:
+        with conn.MT5_LOCK:
+            positions = mt5.positions_get(symbol=MT5_SYMBOL) or ()
+    by_magic: PositionsByMagic = {}
+    for p in positions:
+        by_magic.setdefault(p.magic, {})[p.ticket] = p
+    return by_magic
+
+
+def get_positions_for_strategy(
+    cfg: "StrategyConfig",
+    positions: Optional[Dict[int, Any]] = None,
+) -> Dict[int, BotPositionInfo]:
+    """
+    Return all live MT5 positions matching this strategy's magic number.
+    positions: this magic's {ticket: pos} from group_positions_by_magic();
+    fetched from MT5 if omitted.
+    """
+    if positions is None:
+        positions = group_positions_by_magic().get(cfg.magic, {})
     result: Dict[int, BotPositionInfo] = {}
-    if not poss:
-        return result
 
-    for p in poss:
-        if p.magic != cfg.magic:
-            continue
+    for p in positions.values():
         direction  = "buy" if p.type == mt5.POSITION_TYPE_BUY else "sell"
-        entry_time = datetime.fromtimestamp(p.time, tz=__import__("pytz").timezone("UTC"))
+        entry_time = datetime.fromtimestamp(p.time, tz=UTC)
         result[p.ticket] = BotPositionInfo(
             ticket=p.ticket,
             direction=direction,
@@ -365,6 +716,7 @@ def get_positions_for_strategy(cfg: "StrategyConfig") -> Dict[int, BotPositionIn
             sl_price=p.sl,
             tp_price=p.tp if p.tp > 0 else None,
             initial_sl_price=p.sl,  # will be overwritten in refresh if already tracked
+            entry_ts=float(p.time),
         )
     return result
 
@@ -373,24 +725,32 @@ def get_positions_for_strategy(cfg: "StrategyConfig") -> Dict[int, BotPositionIn
 # INFER CLOSE REASON FROM HISTORY
 # ─────────────────────────────────────────────
 
+# MT5 deal reason code → short label used in close logs
+_DEAL_REASON_NAMES: Dict[int, str] = {
+    mt5.DEAL_REASON_SL:       "SL",
+    mt5.DEAL_REASON_TP:       "TP",
+    mt5.DEAL_REASON_SO:       "StopOut",
+    mt5.DEAL_REASON_CLIENT:   "Manual",
+    mt5.DEAL_REASON_EXPERT:   "Expert",
+    mt5.DEAL_REASON_MARGINAL: "Margin",
+}
+
+
 def infer_close_reason(ticket: int) -> str:
     """
     Best-effort: look up the close reason from MT5 deal history.
     Returns a short string like "TP (price=2100.50, profit=+85.00)".
     """
     try:
-        from pytz import timezone as tz
-        end   = datetime.now(tz("UTC"))
-        start = end - timedelta(days=3)
-
-        deals = mt5.history_deals_get(start, end)
+        # position= filters terminal-side: only this position's deals cross IPC
+        with conn.MT5_LOCK:
+            deals = mt5.history_deals_get(position=ticket)
         if not deals:
             return "unknown"
 
         closing = [
             d for d in deals
-            if getattr(d, "position_id", None) == ticket
-            and getattr(d, "entry", None) in (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY)
+            if getattr(d, "entry", None) in (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY)
         ]
         if not closing:
             return "unknown"
@@ -400,15 +760,7 @@ def infer_close_reason(ticket: int) -> str:
         price   = getattr(last, "price",  0.0)
         code    = getattr(last, "reason", None)
 
-        reason_map = {
-            mt5.DEAL_REASON_SL:       "SL",
-            mt5.DEAL_REASON_TP:       "TP",
-            mt5.DEAL_REASON_SO:       "StopOut",
-            mt5.DEAL_REASON_CLIENT:   "Manual",
-            mt5.DEAL_REASON_EXPERT:   "Expert",
-            mt5.DEAL_REASON_MARGINAL: "Margin",
-        }
-        base = reason_map.get(code, f"Other({code})")
+        base = _DEAL_REASON_NAMES.get(code, f"Other({code})")
         return f"{base} (price={price}, profit={profit:+.2f})"
 
     except Exception:
@@ -419,32 +771,40 @@ def infer_close_reason(ticket: int) -> str:
 # REFRESH STATE + LOG FILLS & CLOSES
 # ─────────────────────────────────────────────
 
-def refresh_and_log_closes(state: "StrategyState") -> None:
+def refresh_and_log_closes(
+    state: "StrategyState",
+    positions: Optional[Dict[int, Any]] = None,
+) -> None:
     """
-    Sync state.open_positions with live MT5 snapshot.
+    Sync state.open_positions with live MT5 snapshot
+    (positions: this magic's {ticket: pos}, fetched if omitted).
     Logs:
       - newly filled pending orders (OPENED)
       - positions that disappeared since last call (CLOSED, with reason)
-    Preserves initial_sl_price across loops.
+    Preserves initial_sl_price across loops. Tickets with an async close
+    in flight stay tracked (no re-fill); failed closes are released from
+    state.closing_tickets so time exits retry them.
     """
-    from pytz import timezone
-    from config.config import TRADE_COOLDOWN_SECONDS
-    from src.core.logger import log_strategy
-
-    cfg  = state.config
-    prev = state.open_positions
-    curr = get_positions_for_strategy(cfg)
-
-    prev_tickets = set(prev.keys())
-    curr_tickets = set(curr.keys())
+    cfg          = state.config
+    prev         = state.open_positions
+    curr         = get_positions_for_strategy(cfg, positions)
+    pending      = state.pending_orders
 
     # ── New fills ─────────────────────────────────────────────────────────
-    for ticket in curr_tickets - prev_tickets:
+    new_fills = curr.keys() - prev.keys()
+    for ticket in new_fills:
         info = curr[ticket]
 
+        meta = pending.pop(ticket, None)   # one pop drops the order + its meta
+        if meta is not None:
+            # Carry trade_mode forward into position info
+            info.trade_mode = meta.trade_mode
+
+        if not should_log():
+            continue
+
         # Compute fill quality (d1 = vs market, d2 = vs limit price)
         d1_str = d2_str = "NA"
-        meta   = state.pending_meta.pop(ticket, None)
         if meta is not None:
             entry  = float(info.entry_price)
             if info.direction == "buy":
@@ -455,38 +815,29 @@ def refresh_and_log_closes(state: "StrategyState") -> None:
                 d2 = entry - meta.pending_price
             d1_str = fmt_delta(d1)
             d2_str = fmt_delta(d2)
-            # Carry trade_mode forward into position info
-            info.trade_mode = meta.trade_mode
 
         log_strategy(
             cfg,
-            f"[OPENED] ticket={ticket} dir={info.direction} "
-            f"mode={info.trade_mode} "
-            f"entry={fmt_price(info.entry_price)} "
-            f"SL={fmt_price(info.sl_price)} "
-            f"TP={fmt_price(info.tp_price) if info.tp_price else 'None'} "
-            f"{{d1={d1_str} d2={d2_str}}}",
+            "[OPENED] ticket=%s dir=%s mode=%s entry=%.*f SL=%.*f TP=%s {d1=%s d2=%s}",
+            ticket, info.direction, info.trade_mode,
+            _DIGITS, info.entry_price, _DIGITS, info.sl_price,
+            fmt_price(info.tp_price) if info.tp_price else "None",
+            d1_str, d2_str,
             ticket=ticket,
             direction=info.direction,
             trade_mode=info.trade_mode,
             d1=d1_str, d2=d2_str,
         )
 
-        # Remove the matching pending order tracking entry
-        state.pending_orders.pop(ticket, None)
-
-        # Start cooldown from fill
-        from datetime import timedelta
-        now = datetime.now(timezone("UTC"))
-        state.cooldown_until_utc = now + timedelta(seconds=TRADE_COOLDOWN_SECONDS)
+    if new_fills:
+        # Start cooldown from the (latest) fill
+        state.cooldown_until_ts = time.time() + TRADE_COOLDOWN_SECONDS
 
         # Reset cluster buffer so we only react to NEW clusters after this fill
-        state.cluster_engine.events.clear()
-        state.cluster_engine.last_cluster_time = None
-        state.cluster_engine.last_cluster_side = None
+        state.cluster_engine.reset()
 
     # ── Closes ────────────────────────────────────────────────────────────
-    for ticket in prev_tickets - curr_tickets:
+    for ticket in prev.keys() - curr.keys():
         info   = prev[ticket]
         reason = RECENT_CLOSED_REASONS.pop(ticket, None) or infer_close_reason(ticket)
         log_strategy(
@@ -498,9 +849,11 @@ def refresh_and_log_closes(state: "StrategyState") -> None:
             trade_mode=info.trade_mode,
             closed_reason=reason,
         )
+        del prev[ticket]
 
-    # ── Merge — preserve initial_sl_price and trade_mode across loops ─────
-    merged: Dict[int, BotPositionInfo] = {}
+    # ── Merge in place — preserve initial_sl_price and trade_mode ─────────
+    # prev now holds only surviving tickets; overwriting existing keys and
+    # appending fills never rebuilds or re-hashes the dict.
     for ticket, cur in curr.items():
         prev_info = prev.get(ticket)
         if prev_info is not None:
@@ -509,6 +862,13 @@ def refresh_and_log_closes(state: "StrategyState") -> None:
             cur.breakeven_hit    = prev_info.breakeven_hit
         else:
             cur.initial_sl_price = cur.sl_price
-        merged[ticket] = cur
-
-    state.open_positions = merged
+        prev[ticket] = cur
+
+    # ── Reconcile async closes: gone → done; failed → release for a retry ─
+    closing = state.closing_tickets
+    if closing:
+        for ticket in [
+            t for t, fut in closing.items()
+            if t not in curr or not close_in_flight(fut)
+        ]:
+            del closing[ticket]
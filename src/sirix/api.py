@@ -10,14 +10,18 @@ Responsibilities:
 """
 from __future__ import annotations
 
+import sys
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Optional, Set
+from operator import itemgetter
+from typing import Iterable, List, Optional, Set
 
+import orjson
 import requests
-from pytz import timezone
 
 from config.config import (
-    SIRIX_BASE_URL, SIRIX_ENDPOINT, SIRIX_TOKEN, SIRIX_GROUPS,
+    UTC, SIRIX_BASE_URL, SIRIX_ENDPOINT, SIRIX_TOKEN, SIRIX_GROUPS,
     SIRIX_INSTRUMENT, SIRIX_TZ, SIRIX_HTTP_TIMEOUT, SEEN_ORDERS_MAX_AGE_HOURS,
     VERBOSE_CLUSTERS,
 )
@@ -30,6 +34,12 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
+# One keep-alive session for the process: each poll reuses the pooled
+# TCP/TLS connection instead of paying a fresh handshake.
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
 
 # ─────────────────────────────────────────────
 # SEEN-ORDERS CACHE  (de-duplication + memory-safe)
@@ -42,44 +52,86 @@ class SeenOrdersCache:
     Problem solved:
       The original script used a plain `set` that grew forever. Over a multi-day
       run this wastes memory and, on restart, the set is lost so old orders can
-      re-trigger. This cache purges entries older than SEEN_ORDERS_MAX_AGE_HOURS
-      on every call to `contains()`.
+      re-trigger. This cache purges entries older than SEEN_ORDERS_MAX_AGE_HOURS.
+
+    Expiry is amortised: entries sit in insertion (= first-seen) order, keyed
+    by monotonic time, so a prune pops from the front and stops at the first
+    live entry (O(expired), not O(N)). It runs every _PRUNE_EVERY calls or
+    once the store has doubled since the last prune — not on every lookup.
+    Batch callers (build_new_events) prune_now() once, then use `in` and
+    add_many(), which skip the per-call check entirely.
     """
 
+    _PRUNE_EVERY = 256
+
     def __init__(self, max_age_hours: int = SEEN_ORDERS_MAX_AGE_HOURS):
-        self._max_age  = timedelta(hours=max_age_hours)
-        self._store: dict[str, datetime] = {}   # order_id → first_seen_utc
+        self._max_age  = max_age_hours * 3600.0
+        self._store: "OrderedDict[str, float]" = OrderedDict()   # order_id → first_seen (monotonic)
+        self._calls_since_prune = 0
+        self._size_at_prune     = 0
 
     def contains(self, order_id: str) -> bool:
-        self._prune()
+        self._maybe_prune()
         return order_id in self._store
 
     def add(self, order_id: str) -> None:
-        self._prune()
+        self._maybe_prune()
         if order_id not in self._store:
-            self._store[order_id] = datetime.now(timezone("UTC"))
+            self._store[order_id] = time.monotonic()
 
     def bootstrap(self, order_ids: Set[str]) -> None:
         """Pre-populate at startup to ignore all pre-existing orders."""
-        ts = datetime.now(timezone("UTC"))
-        for oid in order_ids:
-            self._store[oid] = ts
+        self._store.update(dict.fromkeys(order_ids, time.monotonic()))
+        self._size_at_prune = len(self._store)
         log(f"[SIRIX] Bootstrap: ignoring {len(order_ids)} pre-existing OrderIDs")
 
+    def prune_now(self) -> None:
+        """Expire old entries immediately (call once before a batch of lookups)."""
+        self._prune()
+
+    def add_many(self, order_ids: Iterable[str]) -> None:
+        """Record a batch of OrderIDs without per-insert prune checks."""
+        ts    = time.monotonic()
+        store = self._store
+        for oid in order_ids:
+            if oid not in store:
+                store[oid] = ts
+
+    def __contains__(self, order_id: str) -> bool:
+        """Raw membership test — no prune (see prune_now)."""
+        return order_id in self._store
+
     def __len__(self) -> int:
         return len(self._store)
 
+    def _maybe_prune(self) -> None:
+        self._calls_since_prune += 1
+        if (
+            self._calls_since_prune >= self._PRUNE_EVERY
+            or len(self._store) >= 2 * max(self._size_at_prune, self._PRUNE_EVERY)
+        ):
+            self._prune()
+
     def _prune(self) -> None:
-        cutoff = datetime.now(timezone("UTC")) - self._max_age
-        expired = [k for k, v in self._store.items() if v < cutoff]
-        for k in expired:
-            del self._store[k]
+        cutoff = time.monotonic() - self._max_age
+        store  = self._store
+        while store:
+            oid, first_seen = next(iter(store.items()))
+            if first_seen >= cutoff:
+                break
+            store.popitem(last=False)
+        self._calls_since_prune = 0
+        self._size_at_prune     = len(store)
 
 
 # ─────────────────────────────────────────────
 # SIDE INFERENCE
 # ─────────────────────────────────────────────
 
+# Indexed by the geometry bits in _infer_side; 0 = SL/TP inconsistent.
+_GEOMETRY_SIDE = (None, "buy", "sell", None)
+
+
 def _infer_side(
     action_type: Optional[int],
     open_rate:   Optional[float],
@@ -94,15 +146,15 @@ def _infer_side(
          (reliable regardless of ActionType encoding changes)
       2) ActionType integer: 0=buy, 1=sell, 2=sell (legacy)
     """
-    # 1) Geometry
-    try:
-        if open_rate and sl and tp and sl > 0 and tp > 0:
-            if sl < open_rate < tp:
-                return "buy"
-            if tp < open_rate < sl:
-                return "sell"
-    except Exception:
-        pass
+    # 1) Geometry — bit0 = (SL < open < TP), bit1 = (TP < open < SL)
+    if open_rate and sl and tp and sl > 0 and tp > 0:
+        geom = (
+            ((sl < open_rate) & (open_rate < tp))
+            | (((tp < open_rate) & (open_rate < sl)) << 1)
+        )
+        side = _GEOMETRY_SIDE[geom]
+        if side is not None:
+            return side
 
     # 2) ActionType fallback
     if action_type == 0:
@@ -121,7 +173,16 @@ def _parse_utc(ts: str) -> datetime:
     """
     Parse SiRiX ISO8601 timestamp → UTC-aware datetime.
     Naive datetimes are assumed to be Israel time (SIRIX_TZ).
+
+    Fast path: SiRiX sends fixed-width `YYYY-MM-DDTHH:MM:SS` with an optional
+    `.fffffff` fraction and/or `Z`, which is sliced directly. Anything else
+    (explicit offsets, odd widths) goes through fromisoformat/strptime.
     """
+    try:
+        return _parse_fixed(ts)
+    except (ValueError, IndexError):
+        pass
+
     if ts.endswith("Z"):
         ts = ts[:-1] + "+00:00"
     try:
@@ -132,7 +193,32 @@ def _parse_utc(ts: str) -> datetime:
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=SIRIX_TZ)
 
-    return dt.astimezone(timezone("UTC"))
+    return dt.astimezone(UTC)
+
+
+def _parse_fixed(ts: str) -> datetime:
+    """Slice-parse `YYYY-MM-DDTHH:MM:SS[.f+][Z]`; ValueError if not that shape."""
+    if ts[4] != "-" or ts[7] != "-" or ts[10] not in "T " or ts[13] != ":" or ts[16] != ":":
+        raise ValueError(ts)
+
+    rest = ts[19:]
+    tz   = SIRIX_TZ
+    if rest.endswith("Z"):
+        rest = rest[:-1]
+        tz   = UTC
+
+    micro = 0
+    if rest:
+        if rest[0] != "." or not rest[1:].isdigit():
+            raise ValueError(ts)
+        micro = int(rest[1:7].ljust(6, "0"))
+
+    dt = datetime(
+        int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+        int(ts[11:13]), int(ts[14:16]), int(ts[17:19]), micro,
+        tzinfo=tz,
+    )
+    return dt if tz is UTC else dt.astimezone(UTC)
 
 
 # ─────────────────────────────────────────────
@@ -144,7 +230,7 @@ def fetch_raw_positions(lookback_seconds: int) -> List[dict]:
     Call SiRiX API and return raw position list.
     Returns [] on any network / parse error (bot continues on next iteration).
     """
-    now   = datetime.now(timezone("UTC"))
+    now   = datetime.now(UTC)
     start = now - timedelta(seconds=lookback_seconds)
 
     payload = {
@@ -154,14 +240,13 @@ def fetch_raw_positions(lookback_seconds: int) -> List[dict]:
     }
 
     try:
-        resp = requests.post(
+        resp = _SESSION.post(
             SIRIX_BASE_URL + SIRIX_ENDPOINT,
-            headers=HEADERS,
             json=payload,
             timeout=SIRIX_HTTP_TIMEOUT,
         )
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
 
         if isinstance(data, dict) and "OpenPositions" in data:
             return data["OpenPositions"]
@@ -176,6 +261,22 @@ def fetch_raw_positions(lookback_seconds: int) -> List[dict]:
         return []
 
 
+# Record fields read per SiRiX position, with the default used when a key
+# is missing. The common (complete) record is unpacked by one C-level call.
+_FIELD_DEFAULTS = (
+    ("InstrumentName", None),
+    ("OrderID",        ""),
+    ("ActionType",     None),
+    ("OpenRate",       None),
+    ("StopLoss",       None),
+    ("TakeProfit",     None),
+    ("UserID",         ""),
+    ("AmountLots",     0.0),
+    ("OpenTime",       ""),
+)
+_GET_FIELDS = itemgetter(*(k for k, _ in _FIELD_DEFAULTS))
+
+
 def build_new_events(
     raw_positions: List[dict],
     cache: SeenOrdersCache,
@@ -185,40 +286,43 @@ def build_new_events(
     Convert raw SiRiX position dicts into SirixPositionEvent objects,
     filtering out already-seen OrderIDs and optionally those before min_open_time.
     """
-    events: List[SirixPositionEvent] = []
+    events:  List[SirixPositionEvent] = []
+    new_ids: Set[str] = set()   # marked seen in one batch after the loop
 
+    cache.prune_now()
     for pos in raw_positions:
         try:
-            if pos.get("InstrumentName") != SIRIX_INSTRUMENT:
+            try:
+                inst, oid, action, rate, sl, tp, uid, lots, otime = _GET_FIELDS(pos)
+            except KeyError:
+                inst, oid, action, rate, sl, tp, uid, lots, otime = (
+                    pos.get(k, d) for k, d in _FIELD_DEFAULTS
+                )
+            if inst != SIRIX_INSTRUMENT:
                 continue
 
-            order_id = str(pos.get("OrderID", ""))
-            if not order_id or cache.contains(order_id):
+            order_id = str(oid)
+            if not order_id or order_id in cache or order_id in new_ids:
                 continue
 
-            side = _infer_side(
-                action_type=pos.get("ActionType"),
-                open_rate=pos.get("OpenRate"),
-                sl=pos.get("StopLoss"),
-                tp=pos.get("TakeProfit"),
-            )
+            side = _infer_side(action_type=action, open_rate=rate, sl=sl, tp=tp)
             if side is None:
                 continue
 
-            open_time = _parse_utc(pos.get("OpenTime", ""))
+            open_time = _parse_utc(otime)
             if min_open_time is not None and open_time < min_open_time:
-                cache.add(order_id)  # mark seen so we skip on next call too
+                new_ids.add(order_id)  # mark seen so we skip on next call too
                 continue
 
             ev = SirixPositionEvent(
                 order_id=order_id,
-                user_id=str(pos.get("UserID", "")),
+                user_id=sys.intern(str(uid)),
                 side=side,
-                lots=float(pos.get("AmountLots", 0.0)),
+                lots=float(lots),
                 time=open_time,
             )
             events.append(ev)
-            cache.add(order_id)
+            new_ids.add(order_id)
 
             if VERBOSE_CLUSTERS:
                 log(
@@ -230,4 +334,5 @@ def build_new_events(
             log(f"[SIRIX] Parse error: {e}", level="WARN")
             continue
 
+    cache.add_many(new_ids)
     return events
@@ -43,66 +43,76 @@ BREAKEVEN LOGIC
 """
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Optional, List, TYPE_CHECKING, Tuple
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, List, TYPE_CHECKING, Tuple
 
 import MetaTrader5 as mt5
+import numpy as np
 
 from config.config import (
-    MT5_SYMBOL, TRADE_COOLDOWN_SECONDS,
-    VERBOSE_HYBRID, VERBOSE_CLUSTER_DEBUG,
+    UTC, MT5_SYMBOL, TRADE_COOLDOWN_SECONDS,
+    COOLDOWN_HEARTBEAT_SECONDS, PENDING_ORDER_TIMEOUT_MIN,
+    VERBOSE_HYBRID, VERBOSE_CLUSTER_DEBUG, VERBOSE_TRADE_EVENTS,
+    make_comment,
 )
-from src.core.models import SirixPositionEvent
-from src.core.indicators import fetch_m1_rates, compute_atr, compute_rsi, compute_vwap
-from src.core.logger import log_strategy
+from src.core.models import PendingOrderMeta, PendingRequest, SirixPositionEvent
+from src.core.indicators import TrailStats, fetch_m1_rates, compute_rsi, compute_vwap
+from src.core.logger import log_strategy, should_log
 from src.core.filters import within_session
 from src.mt5.execution import (
-    place_pending_entry, close_position, modify_sl_tp,
-    enforce_stop_level, fmt_price,
+    build_pending_request, close_position, modify_sl_tp,
+    enforce_stop_level, fmt_price, group_positions_by_magic, order_send,
+    round_prices,
 )
 import src.mt5.connection as conn
 
 if TYPE_CHECKING:
     from src.core.models import StrategyConfig, StrategyState
 
+# MT5 constants used inside per-order / per-position loops
+_ORDER_TYPE_BUY      = mt5.ORDER_TYPE_BUY
+_ORDER_TYPE_SELL     = mt5.ORDER_TYPE_SELL
+_TRADE_ACTION_REMOVE = mt5.TRADE_ACTION_REMOVE
+_TRADE_RETCODE_DONE  = mt5.TRADE_RETCODE_DONE
+
 
 # ─────────────────────────────────────────────
 # HELPERS
 # ─────────────────────────────────────────────
 
-def _utc_now() -> datetime:
-    from pytz import timezone
-    return datetime.now(timezone("UTC"))
-
-
 def _inverse_side(side: str) -> str:
     return "sell" if side == "buy" else "buy"
 
 
-def _in_cooldown(state: "StrategyState", now: datetime) -> bool:
-    return state.cooldown_until_utc is not None and now < state.cooldown_until_utc
+def _in_cooldown(state: "StrategyState", now_ts: float) -> bool:
+    until = state.cooldown_until_ts
+    return until is not None and now_ts < until
 
 
-def _log_cooldown(state: "StrategyState", now: datetime) -> bool:
-    """Log cooldown start/end once. Returns whether cooldown is currently active."""
-    from config.config import COOLDOWN_HEARTBEAT_SECONDS
-    active = _in_cooldown(state, now)
+def _log_cooldown(state: "StrategyState", now_ts: float) -> bool:
+    """
+    Log cooldown start/end once. Returns whether cooldown is currently active.
+    Times are UTC epoch seconds; a datetime is only built for the START line.
+    """
+    active = _in_cooldown(state, now_ts)
     cfg    = state.config
 
     if active and not state._cooldown_active_last:
-        log_strategy(cfg, f"[COOLDOWN] START until {state.cooldown_until_utc.isoformat()}")
-        state._cooldown_last_heartbeat_utc = now
+        until = datetime.fromtimestamp(state.cooldown_until_ts, UTC)
+        log_strategy(cfg, f"[COOLDOWN] START until {until.isoformat()}")
+        state._cooldown_last_heartbeat_ts = now_ts
 
     if not active and state._cooldown_active_last:
         log_strategy(cfg, "[COOLDOWN] END")
-        state._cooldown_last_heartbeat_utc = None
+        state._cooldown_last_heartbeat_ts = None
 
     if active and COOLDOWN_HEARTBEAT_SECONDS > 0:
-        last_hb = state._cooldown_last_heartbeat_utc
-        if last_hb is None or (now - last_hb).total_seconds() >= COOLDOWN_HEARTBEAT_SECONDS:
-            remaining = max(0, int((state.cooldown_until_utc - now).total_seconds()))
+        last_hb = state._cooldown_last_heartbeat_ts
+        if last_hb is None or now_ts - last_hb >= COOLDOWN_HEARTBEAT_SECONDS:
+            remaining = max(0, int(state.cooldown_until_ts - now_ts))
             log_strategy(cfg, f"[COOLDOWN] remaining={remaining}s")
-            state._cooldown_last_heartbeat_utc = now
+            state._cooldown_last_heartbeat_ts = now_ts
 
     state._cooldown_active_last = active
     return active
@@ -112,9 +122,18 @@ def _log_cooldown(state: "StrategyState", now: datetime) -> bool:
 # HYBRID DIRECTION DECISION
 # ─────────────────────────────────────────────
 
+def hybrid_params(cfg: "StrategyConfig") -> Tuple[str, int, float, float, float, bool]:
+    """Direction settings as one tuple, unpacked per decision (see StrategyState._hybrid)."""
+    return (
+        cfg.direction_mode, cfg.rsi_period, cfg.rsi_overbought,
+        cfg.rsi_oversold, cfg.vwap_band_pct, cfg.hybrid_require_both,
+    )
+
+
 def decide_direction(
     cluster_side: str,
     cfg: "StrategyConfig",
+    hybrid: Optional[Tuple[str, int, float, float, float, bool]] = None,
 ) -> Tuple[str, str]:
     """
     Determine trade direction and mode for a detected cluster.
@@ -128,20 +147,56 @@ def decide_direction(
       inverse  → always fade
       momentum → always follow
       hybrid   → use RSI + VWAP to decide per cluster
+
+    hybrid: the cfg's hybrid_params() tuple, if the caller has it frozen.
+    The main loop uses make_direction_decider() instead, which resolves the
+    mode once per strategy.
     """
-    if cfg.direction_mode == "inverse":
+    hybrid = hybrid or hybrid_params(cfg)
+
+    if hybrid[0] == "inverse":
         return _inverse_side(cluster_side), "inverse"
 
-    if cfg.direction_mode == "momentum":
+    if hybrid[0] == "momentum":
         return cluster_side, "momentum"
 
-    # ── Hybrid ─────────────────────────────────────────────────────────────
+    return _decide_hybrid(cluster_side, cfg, hybrid)
+
+
+def make_direction_decider(
+    cfg: "StrategyConfig",
+    hybrid: Optional[Tuple[str, int, float, float, float, bool]] = None,
+) -> Callable[[str], Tuple[str, str]]:
+    """
+    Specialise decide_direction for one strategy: direction_mode is fixed per
+    cfg, so the returned cluster_side -> (trade_side, mode) callable skips
+    the mode dispatch (and, for inverse / momentum, all indicator work).
+    """
+    hybrid = hybrid or hybrid_params(cfg)
+
+    if hybrid[0] == "inverse":
+        return lambda cluster_side: (_inverse_side(cluster_side), "inverse")
+
+    if hybrid[0] == "momentum":
+        return lambda cluster_side: (cluster_side, "momentum")
+
+    return lambda cluster_side: _decide_hybrid(cluster_side, cfg, hybrid)
+
+
+def _decide_hybrid(
+    cluster_side: str,
+    cfg: "StrategyConfig",
+    hybrid: Tuple[str, int, float, float, float, bool],
+) -> Tuple[str, str]:
+    """RSI + VWAP branch of decide_direction."""
+    _, rsi_period, rsi_ob, rsi_os, band, need_both = hybrid
+
     # Fetch indicators (M1 bars — shared fetch, used for both RSI and VWAP)
     try:
-        bars_needed = max(cfg.rsi_period + 5, 300)   # 300 bars ≈ 5 hrs of M1
+        bars_needed = max(rsi_period + 5, 300)   # 300 bars ≈ 5 hrs of M1
         df          = fetch_m1_rates(MT5_SYMBOL, bars=bars_needed)
-        rsi         = compute_rsi(df, cfg.rsi_period)
-        vwap        = compute_vwap(df)
+        rsi         = compute_rsi(df, rsi_period, MT5_SYMBOL)
+        vwap        = compute_vwap(df, MT5_SYMBOL)
         current_px  = float(df["close"].iloc[-1])
     except Exception as e:
         # If indicator fetch fails, fall back to inverse (safer)
@@ -153,16 +208,16 @@ def decide_direction(
         # Crowd is selling — go WITH if:
         #   RSI overbought  (momentum is bearish)
         #   price clearly above VWAP  (price ran up, now rolling over)
-        rsi_cond  = rsi > cfg.rsi_overbought
-        vwap_cond = current_px > vwap * (1.0 + cfg.vwap_band_pct)
+        rsi_cond  = rsi > rsi_ob
+        vwap_cond = current_px > vwap * (1.0 + band)
     else:
         # Crowd is buying — go WITH if:
         #   RSI oversold  (momentum is bullish)
         #   price clearly below VWAP  (price sold off, now bouncing)
-        rsi_cond  = rsi < cfg.rsi_oversold
-        vwap_cond = current_px < vwap * (1.0 - cfg.vwap_band_pct)
+        rsi_cond  = rsi < rsi_os
+        vwap_cond = current_px < vwap * (1.0 - band)
 
-    if cfg.hybrid_require_both:
+    if need_both:
         momentum = rsi_cond and vwap_cond
     else:
         momentum = rsi_cond or vwap_cond
@@ -170,13 +225,13 @@ def decide_direction(
     mode       = "momentum" if momentum else "inverse"
     trade_side = cluster_side if momentum else _inverse_side(cluster_side)
 
-    if VERBOSE_HYBRID:
+    if VERBOSE_HYBRID and should_log("INFO"):
         log_strategy(
             cfg,
-            f"[HYBRID] cluster={cluster_side} RSI={rsi:.1f} VWAP={fmt_price(vwap)} "
-            f"price={fmt_price(current_px)} "
-            f"rsi_cond={rsi_cond} vwap_cond={vwap_cond} "
-            f"→ mode={mode} trade_side={trade_side}",
+            "[HYBRID] cluster=%s RSI=%.1f VWAP=%s price=%s "
+            "rsi_cond=%s vwap_cond=%s → mode=%s trade_side=%s",
+            cluster_side, rsi, fmt_price(vwap), fmt_price(current_px),
+            rsi_cond, vwap_cond, mode, trade_side,
             cluster_side=cluster_side,
             rsi=round(rsi, 2),
             vwap=round(vwap, 2),
@@ -198,10 +253,14 @@ def entry_step(
     state: "StrategyState",
     new_events: List[SirixPositionEvent],
     now: datetime,
-) -> None:
+) -> Optional[PendingRequest]:
     """
     Feed new SiRiX events into the cluster engine and, if a cluster fires
-    and all gates pass, place a pending limit order.
+    and all gates pass, build a pending limit order.
+
+    The order is returned, not sent: the main loop collects every engine's
+    request for this tick, sends them with place_pending_entries_bulk(),
+    then hands each result to record_pending_entry().
     """
     cfg = state.config
 
@@ -215,7 +274,7 @@ def entry_step(
         return
 
     # Gate 3: cooldown (anti-spam after recent fill or placement)
-    if _log_cooldown(state, now):
+    if _log_cooldown(state, now.timestamp()):
         return
 
     # Gate 4: session filter
@@ -228,22 +287,33 @@ def entry_step(
         return
 
     # Gate 6: decide direction (hybrid logic)
-    trade_side, trade_mode = decide_direction(cluster_side, cfg)
+    decide = state._decide_direction
+    if decide is not None:
+        trade_side, trade_mode = decide(cluster_side)
+    else:
+        trade_side, trade_mode = decide_direction(cluster_side, cfg, state._hybrid)
 
-    # Gate 7: place pending limit entry
-    result = place_pending_entry(
+    # Gate 7: build pending limit entry
+    return build_pending_request(
         trade_side=trade_side,
         cfg=cfg,
         offset_dollars=cfg.limit_offset_dollars,
         trade_mode=trade_mode,
     )
 
-    if result is not None:
-        ticket, meta = result
-        state.pending_orders[ticket] = meta.created_at_utc
-        state.pending_meta[ticket]   = meta
-        # Start cooldown immediately after placement
-        state.cooldown_until_utc = now + timedelta(seconds=TRADE_COOLDOWN_SECONDS)
+
+def record_pending_entry(
+    state: "StrategyState",
+    result: Optional[Tuple[int, PendingOrderMeta]],
+    now: datetime,
+) -> None:
+    """Track a placed pending order (result of submit) and start the cooldown."""
+    if result is None:
+        return
+    ticket, meta = result
+    state.pending_orders[ticket] = meta
+    # Start cooldown immediately after placement
+    state.cooldown_until_ts = now.timestamp() + TRADE_COOLDOWN_SECONDS
 
 
 # ─────────────────────────────────────────────
@@ -255,17 +325,16 @@ def manage_pending_orders(state: "StrategyState") -> None:
     1. Remove internal records for orders that are no longer active in MT5.
     2. Cancel any pending order that has exceeded PENDING_ORDER_TIMEOUT_MIN.
     """
-    from config.config import PENDING_ORDER_TIMEOUT_MIN
-    from config.config import make_comment
-
     cfg = state.config
     if not state.pending_orders:
         return
 
-    now = _utc_now()
+    now_ts = time.time()
+    ttl_s  = PENDING_ORDER_TIMEOUT_MIN * 60.0
 
     # Snapshot of active pending orders for this magic
-    mt5_orders = mt5.orders_get(symbol=MT5_SYMBOL)
+    with conn.MT5_LOCK:
+        mt5_orders = mt5.orders_get(symbol=MT5_SYMBOL)
     active: dict[int, object] = {}
     if mt5_orders:
         for o in mt5_orders:
@@ -273,29 +342,33 @@ def manage_pending_orders(state: "StrategyState") -> None:
                 active[o.ticket] = o
 
     # Pass 1: drop records for orders no longer in MT5 (filled or externally cancelled)
-    for ticket in list(state.pending_orders.keys()):
+    for ticket in tuple(state.pending_orders):
         if ticket not in active:
             state.pending_orders.pop(ticket, None)
-            state.pending_meta.pop(ticket, None)
 
     if not state.pending_orders:
         return
 
-    # Pass 2: cancel orders that have exceeded the TTL
-    for ticket, created_at in list(state.pending_orders.items()):
-        age_min = (now - created_at).total_seconds() / 60.0
-        if age_min < PENDING_ORDER_TIMEOUT_MIN:
-            continue
+    # Pass 2: cancel orders that have exceeded the TTL — decide first, then
+    # send back-to-back from one request template
+    expired = [
+        (ticket, now_ts - meta.created_ts)
+        for ticket, meta in state.pending_orders.items()
+        if now_ts - meta.created_ts >= ttl_s
+    ]
+    if not expired:
+        return
+
+    tpl = {
+        "action":  _TRADE_ACTION_REMOVE,
+        "symbol":  MT5_SYMBOL,
+        "magic":   cfg.magic,
+        "comment": make_comment(f"{cfg.name}_TTL"),
+    }
+    results = [order_send({**tpl, "order": ticket}) for ticket, _ in expired]
 
-        req = {
-            "action":  mt5.TRADE_ACTION_REMOVE,
-            "order":   ticket,
-            "symbol":  MT5_SYMBOL,
-            "magic":   cfg.magic,
-            "comment": make_comment(f"{cfg.name}_TTL"),
-        }
-        res = mt5.order_send(req)
-        if res is None or res.retcode != mt5.TRADE_RETCODE_DONE:
+    for (ticket, age_s), res in zip(expired, results):
+        if res is None or res.retcode != _TRADE_RETCODE_DONE:
             log_strategy(
                 cfg,
                 f"[WARN] cancel pending failed ticket={ticket} "
@@ -303,19 +376,124 @@ def manage_pending_orders(state: "StrategyState") -> None:
                 level="WARN", ticket=ticket,
             )
         else:
-            log_strategy(cfg, f"[CANCEL] Pending TTL expired ticket={ticket} age={age_min:.1f}min")
+            log_strategy(cfg, f"[CANCEL] Pending TTL expired ticket={ticket} age={age_s / 60.0:.1f}min")
 
         state.pending_orders.pop(ticket, None)
-        state.pending_meta.pop(ticket, None)
 
 
 # ─────────────────────────────────────────────
 # TRAILING STOPS  (chandelier + breakeven)
 # ─────────────────────────────────────────────
 
-def manage_trailing_stops(state: "StrategyState") -> None:
+# Position count from which the trailing decisions run as NumPy column
+# maths (Python attribute reads only to build the arrays and apply hits).
+_TRAIL_VECTORIZE_MIN_POSITIONS = 16
+
+
+def _trail_decide_np(
+    state: "StrategyState",
+    positions: Dict[int, Any],
+    modifies: Dict[int, Tuple[float, Any]],
+    current_px: float,
+    highest_high: float,
+    lowest_low: float,
+    atr_val: float,
+    last_bar_dt: datetime,
+    point: float,
+    digits: int,
+    min_gap: float,
+    min_move: float,
+) -> None:
+    """
+    Vectorised body of manage_trailing_stops: same steps 1-7 and the same
+    float arithmetic, evaluated over all positions at once. Breakeven hits
+    (rare) are applied per position so round() and logging are unchanged.
+    """
+    cfg   = state.config
+    items = tuple(state.open_positions.items())
+    n     = len(items)
+
+    entry = np.fromiter((i.entry_price      for _, i in items), np.float64, n)
+    init  = np.fromiter((i.initial_sl_price for _, i in items), np.float64, n)
+    sl    = np.fromiter((i.sl_price         for _, i in items), np.float64, n)
+    buy   = np.fromiter((i.direction == "buy" for _, i in items), bool, n)
+
+    # 1) Not on the entry bar, 2) positive initial risk → open_R
+    sl_dist = np.abs(entry - init)
+    live    = np.fromiter((i.entry_time < last_bar_dt for _, i in items), bool, n)
+    live   &= sl_dist > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        open_R = np.where(buy, 1.0, -1.0) * (current_px - entry) / sl_dist
+
+    # 3) Breakeven
+    if cfg.breakeven_trigger_R is not None:
+        be_done = np.fromiter((i.breakeven_hit for _, i in items), bool, n)
+        for k in np.flatnonzero(live & ~be_done & (open_R >= cfg.breakeven_trigger_R)):
+            ticket, info = items[k]
+            be_sl = round(info.entry_price, digits)
+            if (be_sl > info.sl_price) if buy[k] else (be_sl < info.sl_price):
+                modifies[ticket]   = (be_sl, positions[ticket])
+                info.sl_price      = be_sl
+                info.breakeven_hit = True
+                sl[k]              = be_sl
+                if VERBOSE_TRADE_EVENTS and should_log("INFO"):
+                    log_strategy(
+                        cfg,
+                        f"[BREAKEVEN] ticket={ticket} SL moved to entry={fmt_price(be_sl)} "
+                        f"open_R={open_R[k]:.2f}",
+                        ticket=ticket, open_R=round(float(open_R[k]), 3),
+                    )
+
+    # 4) Trailing gate
+    trail = live if cfg.trail_start_R is None else live & (open_R >= cfg.trail_start_R)
+
+    # 5) Chandelier candidate SL (never backwards)
+    trail_atr = cfg.atr_trail_mult * atr_val
+    cand_sl   = np.where(buy, highest_high - trail_atr, lowest_low + trail_atr)
+    new_sl    = np.where(buy, np.maximum(sl, cand_sl), np.minimum(sl, cand_sl))
+
+    if VERBOSE_CLUSTER_DEBUG and should_log("INFO"):
+        for k in np.flatnonzero(trail):
+            ticket, info = items[k]
+            log_strategy(
+                cfg,
+                f"[TRAIL_DBG] ticket={ticket} dir={info.direction} "
+                f"open_R={open_R[k]:.2f} HH={fmt_price(highest_high)} "
+                f"LL={fmt_price(lowest_low)} ATR={atr_val:.2f} "
+                f"cand_SL={fmt_price(cand_sl[k])} cur_SL={fmt_price(info.sl_price)}",
+            )
+
+    # 6) Broker stop level (as enforce_stop_level, relative to current price)
+    stops = getattr(conn.SYMBOL_INFO, "trade_stops_level", 0)
+    if stops and stops > 0:
+        min_dist = stops * point
+        new_sl   = np.where(
+            buy,
+            np.where(current_px - new_sl < min_dist, current_px - min_dist, new_sl),
+            np.where(new_sl - current_px < min_dist, current_px + min_dist, new_sl),
+        )
+    new_sl = round_prices(new_sl)
+
+    # Safety guards (correct side, min 3 points away) + 7) meaningful move
+    safe = np.where(
+        buy,
+        (new_sl < current_px) & (current_px - new_sl >= min_gap),
+        (new_sl > current_px) & (new_sl - current_px >= min_gap),
+    )
+    for k in np.flatnonzero(trail & safe & (np.abs(new_sl - sl) > min_move)):
+        ticket, info  = items[k]
+        info.sl_price = float(new_sl[k])
+        modifies[ticket] = (info.sl_price, positions[ticket])
+
+
+def manage_trailing_stops(
+    state: "StrategyState",
+    positions: Optional[Dict[int, Any]] = None,
+) -> None:
     """
     On each M1 bar, update SL for all open positions using the chandelier method.
+    positions: this magic's {ticket: pos} snapshot for the iteration
+    (fetched once here if omitted).
 
     Order of operations per position:
       1. Skip if still on entry bar (give trade room to breathe).
@@ -326,6 +504,10 @@ def manage_trailing_stops(state: "StrategyState") -> None:
          (for buys) or LL(lookback) + ATR × atr_trail_mult (for sells).
       5. Enforce broker stop level and safety guards.
       6. Send modify only if SL moved by more than 2 points.
+
+    The pass is skipped outright when its inputs (bar, ATR, HH/LL, price,
+    per-position SL) match the previous pass; modifies are sent after all
+    decisions, at most one per ticket.
     """
     cfg = state.config
     if cfg.stop_mode != "chandelier" or not state.open_positions:
@@ -340,122 +522,170 @@ def manage_trailing_stops(state: "StrategyState") -> None:
         log_strategy(cfg, f"[TRAIL] Failed to fetch M1 rates: {e}", level="WARN")
         return
 
-    atr_val      = compute_atr(df, cfg.atr_period)
-    highest_high = float(df["high"].iloc[-lookback:].max())
-    lowest_low   = float(df["low"].iloc[-lookback:].min())
+    # Streaming ATR / HH / LL: closed bars folded once, forming bar per call
+    stats = state._trail_stats
+    if stats is None or stats.period != cfg.atr_period or stats.lookback != lookback:
+        stats = state._trail_stats = TrailStats(cfg.atr_period, lookback)
+    atr_val, highest_high, lowest_low = stats.update(df)
     last_bar_ts  = df["time"].iloc[-1]
-    current_px   = float(df["close"].iloc[-1])
+    current_px   = float(df["close"].to_numpy()[-1])
     point        = conn.SYMBOL_INFO.point
+    digits       = conn.SYMBOL_INFO.digits
+    min_gap      = 3.0 * point   # SL must stay this far from price
+    min_move     = 2.0 * point   # smallest SL change worth a modify
+
+    if positions is None:
+        positions = group_positions_by_magic().get(cfg.magic, {})
+
+    # Verify positions still exist in MT5
+    for ticket in [t for t in state.open_positions if t not in positions]:
+        state.open_positions.pop(ticket, None)
+
+    # Every input below is in this key; if none moved since the last pass,
+    # that pass's decisions (already applied to info.sl_price) still stand.
+    trail_key = (
+        last_bar_ts, atr_val, highest_high, lowest_low, current_px,
+        tuple((t, i.sl_price, i.breakeven_hit) for t, i in state.open_positions.items()),
+    )
+    if trail_key == state._trail_key:
+        return
 
-    for ticket, info in list(state.open_positions.items()):
-        # Verify position still exists in MT5
-        poss = mt5.positions_get()
-        pos  = None
-        if poss:
-            for p in poss:
-                if p.ticket == ticket and p.magic == cfg.magic:
-                    pos = p
-                    break
-        if pos is None:
-            state.open_positions.pop(ticket, None)
-            continue
-
-        # 1) Don't trail on entry bar
-        if info.entry_time >= last_bar_ts:
-            continue
+    # Decide everything against this snapshot first, then send one modify
+    # per ticket (the final SL if breakeven and trailing both fire).
+    modifies: Dict[int, Tuple[float, Any]] = {}
 
-        # 2) Compute open_R for gates
-        sl_dist = abs(info.entry_price - info.initial_sl_price)
-        if sl_dist <= 0:
-            continue
+    if len(state.open_positions) >= _TRAIL_VECTORIZE_MIN_POSITIONS:
+        _trail_decide_np(
+            state, positions, modifies, current_px, highest_high, lowest_low,
+            atr_val, last_bar_ts.to_pydatetime(), point, digits, min_gap, min_move,
+        )
+    else:
+        for ticket, info in state.open_positions.items():
+            pos = positions[ticket]
 
-        if info.direction == "buy":
-            open_R = (current_px - info.entry_price) / sl_dist
-        else:
-            open_R = (info.entry_price - current_px) / sl_dist
-
-        # 3) Breakeven: move SL to entry once we hit +breakeven_trigger_R
-        if (
-            cfg.breakeven_trigger_R is not None
-            and not info.breakeven_hit
-            and open_R >= cfg.breakeven_trigger_R
-        ):
-            be_sl = round(info.entry_price, conn.SYMBOL_INFO.digits)
-            # Only move SL if it improves (moves in our favour)
-            improved = (
-                (info.direction == "buy"  and be_sl > info.sl_price)
-                or (info.direction == "sell" and be_sl < info.sl_price)
-            )
-            if improved:
-                modify_sl_tp(ticket, cfg, be_sl, info.tp_price)
-                info.sl_price    = be_sl
-                info.breakeven_hit = True
-                log_strategy(
-                    cfg,
-                    f"[BREAKEVEN] ticket={ticket} SL moved to entry={fmt_price(be_sl)} "
-                    f"open_R={open_R:.2f}",
-                    ticket=ticket, open_R=round(open_R, 3),
-                )
+            # 1) Don't trail on entry bar
+            if info.entry_time >= last_bar_ts:
+                continue
 
-        # 4) Trailing gate: only trail if open_R >= trail_start_R
-        if cfg.trail_start_R is not None and open_R < cfg.trail_start_R:
-            continue
+            # 2) Compute open_R for gates
+            sl_dist = abs(info.entry_price - info.initial_sl_price)
+            if sl_dist <= 0:
+                continue
 
-        # 5) Chandelier candidate SL
-        if info.direction == "buy":
-            cand_sl = highest_high - cfg.atr_trail_mult * atr_val
-            new_sl  = max(info.sl_price, cand_sl)   # never move SL backwards
-        else:
-            cand_sl = lowest_low + cfg.atr_trail_mult * atr_val
-            new_sl  = min(info.sl_price, cand_sl)
+            if info.direction == "buy":
+                open_R = (current_px - info.entry_price) / sl_dist
+            else:
+                open_R = (info.entry_price - current_px) / sl_dist
+
+            # 3) Breakeven: move SL to entry once we hit +breakeven_trigger_R
+            if (
+                cfg.breakeven_trigger_R is not None
+                and not info.breakeven_hit
+                and open_R >= cfg.breakeven_trigger_R
+            ):
+                be_sl = round(info.entry_price, digits)
+                # Only move SL if it improves (moves in our favour)
+                improved = (
+                    (info.direction == "buy"  and be_sl > info.sl_price)
+                    or (info.direction == "sell" and be_sl < info.sl_price)
+                )
+                if improved:
+                    modifies[ticket] = (be_sl, pos)
+                    info.sl_price    = be_sl
+                    info.breakeven_hit = True
+                    if VERBOSE_TRADE_EVENTS and should_log("INFO"):
+                        log_strategy(
+                            cfg,
+                            f"[BREAKEVEN] ticket={ticket} SL moved to entry={fmt_price(be_sl)} "
+                            f"open_R={open_R:.2f}",
+                            ticket=ticket, open_R=round(open_R, 3),
+                        )
+
+            # 4) Trailing gate: only trail if open_R >= trail_start_R
+            if cfg.trail_start_R is not None and open_R < cfg.trail_start_R:
+                continue
 
-        if VERBOSE_CLUSTER_DEBUG:
-            log_strategy(
-                cfg,
-                f"[TRAIL_DBG] ticket={ticket} dir={info.direction} "
-                f"open_R={open_R:.2f} HH={fmt_price(highest_high)} "
-                f"LL={fmt_price(lowest_low)} ATR={atr_val:.2f} "
-                f"cand_SL={fmt_price(cand_sl)} cur_SL={fmt_price(info.sl_price)}",
-            )
+            # 5) Chandelier candidate SL
+            if info.direction == "buy":
+                cand_sl = highest_high - cfg.atr_trail_mult * atr_val
+                new_sl  = max(info.sl_price, cand_sl)   # never move SL backwards
+            else:
+                cand_sl = lowest_low + cfg.atr_trail_mult * atr_val
+                new_sl  = min(info.sl_price, cand_sl)
 
-        # 6) Enforce broker stop level
-        ot      = mt5.ORDER_TYPE_BUY if info.direction == "buy" else mt5.ORDER_TYPE_SELL
-        new_sl, _ = enforce_stop_level(ot, current_px, new_sl, info.tp_price)
+            if VERBOSE_CLUSTER_DEBUG and should_log("INFO"):
+                log_strategy(
+                    cfg,
+                    f"[TRAIL_DBG] ticket={ticket} dir={info.direction} "
+                    f"open_R={open_R:.2f} HH={fmt_price(highest_high)} "
+                    f"LL={fmt_price(lowest_low)} ATR={atr_val:.2f} "
+                    f"cand_SL={fmt_price(cand_sl)} cur_SL={fmt_price(info.sl_price)}",
+                )
 
-        # Safety guards: SL must be on correct side, min 3 points away
-        if info.direction == "buy":
-            if new_sl >= current_px:
-                continue
-            if current_px - new_sl < 3 * point:
-                continue
-        else:
-            if new_sl <= current_px:
-                continue
-            if new_sl - current_px < 3 * point:
-                continue
+            # 6) Enforce broker stop level
+            ot      = _ORDER_TYPE_BUY if info.direction == "buy" else _ORDER_TYPE_SELL
+            new_sl, _ = enforce_stop_level(ot, current_px, new_sl, info.tp_price)
+
+            # Safety guards: SL must be on correct side, min 3 points away
+            if info.direction == "buy":
+                if new_sl >= current_px:
+                    continue
+                if current_px - new_sl < min_gap:
+                    continue
+            else:
+                if new_sl <= current_px:
+                    continue
+                if new_sl - current_px < min_gap:
+                    continue
+
+            # 7) Only send modify if SL moved meaningfully (> 2 points)
+            if abs(new_sl - info.sl_price) > min_move:
+                modifies[ticket] = (new_sl, pos)
+                info.sl_price = new_sl
+
+    state._trail_key = (
+        trail_key[:5]
+        + (tuple((t, i.sl_price, i.breakeven_hit) for t, i in state.open_positions.items()),)
+    )
 
-        # 7) Only send modify if SL moved meaningfully (> 2 points)
-        if abs(new_sl - info.sl_price) > 2 * point:
-            modify_sl_tp(ticket, cfg, new_sl, info.tp_price)
-            info.sl_price = new_sl
+    open_positions = state.open_positions
+    closing        = state.closing_tickets
+    for ticket, (sl, pos) in modifies.items():
+        if ticket in closing:
+            continue   # close already in flight — don't race it with a modify
+        modify_sl_tp(ticket, cfg, sl, open_positions[ticket].tp_price, pos=pos)
 
 
 # ─────────────────────────────────────────────
 # TIME EXITS
 # ─────────────────────────────────────────────
 
-def manage_time_exits(state: "StrategyState") -> None:
+def manage_time_exits(
+    state: "StrategyState",
+    positions: Optional[Dict[int, Any]] = None,
+) -> None:
     """
     Close positions that have exceeded hold_minutes (if use_time_exit is True).
+    positions: this magic's {ticket: pos} snapshot, handed to close_position.
+
+    The close is async: the ticket stays in open_positions (and is parked in
+    closing_tickets) until refresh_and_log_closes sees it gone, or sees the
+    close fail — then the next pass retries.
     """
     cfg = state.config
-    if not cfg.use_time_exit or cfg.hold_minutes <= 0:
+    if not cfg.use_time_exit or cfg.hold_minutes <= 0 or not state.open_positions:
         return
 
-    now = _utc_now()
-    for ticket, info in list(state.open_positions.items()):
-        elapsed = (now - info.entry_time).total_seconds() / 60.0
-        if elapsed >= cfg.hold_minutes:
-            log_strategy(cfg, f"[TIME_EXIT] ticket={ticket} elapsed={elapsed:.1f}min")
-            close_position(ticket, cfg, reason="TimeExit")
-            state.open_positions.pop(ticket, None)
+    now_ts  = time.time()
+    hold_s  = cfg.hold_minutes * 60.0
+    closing = state.closing_tickets
+    for ticket, info in state.open_positions.items():
+        if ticket in closing:
+            continue
+        elapsed_s = now_ts - info.entry_ts
+        if elapsed_s >= hold_s:
+            log_strategy(cfg, f"[TIME_EXIT] ticket={ticket} elapsed={elapsed_s / 60.0:.1f}min")
+            pos = positions.get(ticket) if positions is not None else None
+            fut = close_position(ticket, cfg, reason="TimeExit", pos=pos)
+            if fut is not None:
+                closing[ticket] = fut
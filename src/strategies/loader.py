@@ -13,27 +13,36 @@ To add a new bot:
 """
 from __future__ import annotations
 
+from operator import itemgetter
 from pathlib import Path
 from typing import List
 
 import yaml
 
+try:                                   # libyaml C parser when available
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 from config.config import STRATEGIES_YAML_PATH
 from src.core.models import StrategyConfig, StrategyState
 from src.core.cluster_engine import ClusterEngine
+from src.strategies.chandelier import hybrid_params, make_direction_decider
 from src.core.logger import log
 
 
-# Required YAML fields per strategy entry.
+# Required YAML fields per strategy entry (order = unpack order below).
 # Missing any of these will raise a clear error at startup.
-_REQUIRED = [
+_REQUIRED_FIELDS = (
     "name", "magic",
     "t_seconds", "k_unique",
     "hold_minutes", "sl_distance", "tp_R_multiple", "use_tp_exit", "use_time_exit",
     "stop_mode", "atr_period", "atr_init_mult", "atr_trail_mult",
     "limit_offset_dollars", "max_open_positions",
     "risk_mode", "risk_percent", "fixed_lots", "static_risk_base_balance",
-]
+)
+_REQUIRED     = frozenset(_REQUIRED_FIELDS)
+_get_required = itemgetter(*_REQUIRED_FIELDS)
 
 
 def load_strategies(bot_key: str) -> List[StrategyState]:
@@ -46,7 +55,7 @@ def load_strategies(bot_key: str) -> List[StrategyState]:
         raise FileNotFoundError(f"strategies.yaml not found at {STRATEGIES_YAML_PATH}")
 
     with STRATEGIES_YAML_PATH.open("r", encoding="utf-8") as f:
-        all_data = yaml.safe_load(f)
+        all_data = yaml.load(f, Loader=_YamlLoader)
 
     if bot_key not in all_data:
         raise KeyError(
@@ -67,41 +76,51 @@ def load_strategies(bot_key: str) -> List[StrategyState]:
             continue
 
         # Validate required fields
-        missing = [k for k in _REQUIRED if k not in entry]
+        missing = _REQUIRED - entry.keys()
         if missing:
             raise ValueError(
-                f"Strategy '{entry.get('name','?')}' is missing required fields: {missing}"
+                f"Strategy '{entry.get('name','?')}' is missing required fields: "
+                f"{[k for k in _REQUIRED_FIELDS if k in missing]}"
             )
 
+        (
+            name, magic,
+            t_seconds, k_unique,
+            hold_minutes, sl_distance, tp_R_multiple, use_tp_exit, use_time_exit,
+            stop_mode, atr_period, atr_init_mult, atr_trail_mult,
+            limit_offset_dollars, max_open_positions,
+            risk_mode, risk_percent, fixed_lots, static_risk_base_balance,
+        ) = _get_required(entry)
+
         cfg = StrategyConfig(
-            name=entry["name"],
-            magic=int(entry["magic"]),
-
-            t_seconds=int(entry["t_seconds"]),
-            k_unique=int(entry["k_unique"]),
-
-            hold_minutes=int(entry["hold_minutes"]),
-            sl_distance=float(entry["sl_distance"]),
-            tp_R_multiple=float(entry["tp_R_multiple"]),
-            use_tp_exit=bool(entry["use_tp_exit"]),
-            use_time_exit=bool(entry["use_time_exit"]),
-
-            stop_mode=str(entry["stop_mode"]),
-            atr_period=int(entry["atr_period"]),
-            atr_init_mult=float(entry["atr_init_mult"]),
-            atr_trail_mult=float(entry["atr_trail_mult"]),
+            name=name,
+            magic=int(magic),
+
+            t_seconds=int(t_seconds),
+            k_unique=int(k_unique),
+
+            hold_minutes=int(hold_minutes),
+            sl_distance=float(sl_distance),
+            tp_R_multiple=float(tp_R_multiple),
+            use_tp_exit=bool(use_tp_exit),
+            use_time_exit=bool(use_time_exit),
+
+            stop_mode=str(stop_mode),
+            atr_period=int(atr_period),
+            atr_init_mult=float(atr_init_mult),
+            atr_trail_mult=float(atr_trail_mult),
             chan_lookback=entry.get("chan_lookback"),  # Optional[int]
 
             trail_start_R=entry.get("trail_start_R"),            # Optional[float]
             breakeven_trigger_R=entry.get("breakeven_trigger_R"), # Optional[float]
 
-            limit_offset_dollars=float(entry["limit_offset_dollars"]),
-            max_open_positions=int(entry["max_open_positions"]),
+            limit_offset_dollars=float(limit_offset_dollars),
+            max_open_positions=int(max_open_positions),
 
-            risk_mode=str(entry["risk_mode"]),
-            risk_percent=float(entry["risk_percent"]),
-            fixed_lots=float(entry["fixed_lots"]),
-            static_risk_base_balance=float(entry["static_risk_base_balance"]),
+            risk_mode=str(risk_mode),
+            risk_percent=float(risk_percent),
+            fixed_lots=float(fixed_lots),
+            static_risk_base_balance=float(static_risk_base_balance),
 
             # Hybrid / direction
             direction_mode=str(entry.get("direction_mode", "hybrid")),
@@ -117,7 +136,13 @@ def load_strategies(bot_key: str) -> List[StrategyState]:
             k_unique=cfg.k_unique,
         )
 
-        states.append(StrategyState(config=cfg, cluster_engine=cluster_engine))
+        hybrid = hybrid_params(cfg)
+        states.append(StrategyState(
+            config=cfg,
+            cluster_engine=cluster_engine,
+            _hybrid=hybrid,
+            _decide_direction=make_direction_decider(cfg, hybrid),
+        ))
         log(
             f"[LOADER] Loaded strategy: {cfg.name} | magic={cfg.magic} | "
             f"T={cfg.t_seconds}s K={cfg.k_unique} | stop={cfg.stop_mode} | "